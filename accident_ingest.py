@@ -0,0 +1,453 @@
+import os
+import re
+import json
+import pickle
+import hashlib
+import warnings
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from master_store import DERIVED_COLUMNS, add_derived_columns
+
+# --- 共通の取り込みライン（build_fatal_db.py / build_master_db.py から利用） ---
+# ワーカープロセスからも import されるため、ここにはトップレベルの処理を書かないこと
+warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
+warnings.filterwarnings('ignore', category=UserWarning, module='xlrd')
+
+# 死亡DB特有の絶対座標マッピング
+FATAL_RENAME_MAP = {
+    1: '月',
+    2: '発生時間',
+    3: '災害状況',
+    5: '業種_大分類',
+    7: '業種_中分類',
+    9: '業種_小分類',
+    10: '事業場規模',
+    12: '起因物_大分類',
+    14: '起因物_中分類',
+    16: '起因物_小分類',
+    18: '事故の型'
+}
+
+# 死傷DBの絶対座標マッピング（中分類・小分類の座標 9, 11, 16, 18 を含む）
+INJURY_RENAME_MAP = {
+    2: '年',
+    3: '月',
+    4: '発生時間',
+    5: '災害状況',
+    7: '業種_大分類',
+    9: '業種_中分類',
+    11: '業種_小分類',
+    12: '事業場規模',
+    14: '起因物_大分類',
+    16: '起因物_中分類',
+    18: '起因物_小分類',
+    20: '事故の型',
+    21: '年齢'
+}
+
+# 死傷DBで抽出対象とする業種（インデックス7 = 業種_大分類）
+INJURY_INDUSTRY_COL = 7
+INJURY_TARGET_INDUSTRY = '貨物取扱業'
+
+# マスターの列順（ファイル名由来の「年」→ 絶対座標の列 → 取り込み時の正規化列）
+FATAL_COLUMNS = ['年'] + list(FATAL_RENAME_MAP.values()) + DERIVED_COLUMNS
+INJURY_COLUMNS = list(INJURY_RENAME_MAP.values()) + DERIVED_COLUMNS
+
+# 差分ビルド用のキャッシュ（ワークブック単位のシャードとマニフェスト）
+MANIFEST_NAME = "manifest.json"
+
+
+def shard_cache_dir(output_dir, name):
+    return os.path.join(output_dir, "cache", name)
+
+
+# Excel の読み込みエンジン
+# auto    : calamine（Rust製の python-calamine）が入っていればそれを、無ければ default を使う
+# calamine: calamine を使う（未導入なら default に戻す）
+# default : 従来通り .xlsx は openpyxl、.xls は xlrd
+ENGINES = ['auto', 'calamine', 'default']
+
+# 生グリッドのキャッシュ（rename_map を変えて試すときに Excel を解析し直さないためのもの）
+GRID_CACHE_CHUNK = 10000
+
+
+def calamine_available():
+    return importlib.util.find_spec("python_calamine") is not None
+
+
+def resolve_engine(engine):
+    if engine in ('auto', 'calamine') and calamine_available():
+        return 'calamine'
+    return 'default'
+
+
+def grid_cache_dir(cache_dir):
+    return os.path.join(cache_dir, "grid")
+
+
+def schema_version(*parts):
+    """rename_map や抽出条件から短いハッシュを作る。定義が変わればシャードは全て作り直しになる。"""
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()[:12]
+
+
+# 抽出ロジックを変えたときは末尾の版数を上げてキャッシュを無効化すること
+FATAL_SCHEMA_VERSION = schema_version(FATAL_RENAME_MAP, 'col3_len>10', 'year_from_filename', 2)
+INJURY_SCHEMA_VERSION = schema_version(INJURY_RENAME_MAP, INJURY_INDUSTRY_COL, INJURY_TARGET_INDUSTRY, 2)
+
+
+# --- ストリーミング読み込み（シート全体をDataFrameにせず、条件に合う行だけを残す） ---
+
+def _xlrd_value(cell, datemode):
+    import xlrd
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+        return None
+    if cell.ctype == xlrd.XL_CELL_NUMBER and float(cell.value).is_integer():
+        # pd.read_excel と同じく、整数値の float は int に戻す
+        return int(cell.value)
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        return xlrd.xldate.xldate_as_datetime(cell.value, datemode)
+    return cell.value
+
+
+def _calamine_value(value):
+    if value == '':
+        return None
+    if isinstance(value, float) and value.is_integer():
+        # openpyxl / xlrd と揃えて、整数値の float は int に戻す
+        return int(value)
+    return value
+
+
+def _iter_calamine_rows(file):
+    from python_calamine import CalamineWorkbook
+    sheet = CalamineWorkbook.from_path(file).get_sheet_by_index(0)
+    # calamine は使用範囲の左端から列を返すため、絶対座標がずれないよう左側の空列を補う
+    pad = (None,) * (sheet.start[1] if sheet.start else 0)
+    for row in sheet.iter_rows():
+        yield pad + tuple(_calamine_value(v) for v in row)
+
+
+def iter_sheet_rows(file, engine='default'):
+    """先頭シートを1行ずつ値のタプルとして返す。
+
+    engine が 'calamine' なら python-calamine で読む（.xls / .xlsx とも）。
+    'default' の場合、.xlsx は openpyxl の read_only モードで逐次読みする。
+    .xls は xlrd の on_demand で先頭シートだけを開く（BIFF形式は行単位の逐次読みができないため、
+    セル表だけは保持されるが、pandas の全表DataFrameは作らない）。
+    """
+    if engine == 'calamine':
+        yield from _iter_calamine_rows(file)
+    elif os.path.splitext(file)[1].lower() == '.xls':
+        import xlrd
+        book = xlrd.open_workbook(file, on_demand=True)
+        try:
+            sheet = book.sheet_by_index(0)
+            for r in range(sheet.nrows):
+                yield tuple(_xlrd_value(cell, book.datemode) for cell in sheet.row(r))
+        finally:
+            book.release_resources()
+    else:
+        from openpyxl import load_workbook
+        wb = load_workbook(file, read_only=True, data_only=True)
+        try:
+            yield from wb.worksheets[0].iter_rows(values_only=True)
+        finally:
+            wb.close()
+
+
+def _trim(row):
+    n = len(row)
+    while n and _is_blank(row[n - 1]):
+        n -= 1
+    return tuple(row[:n])
+
+
+def iter_workbook_rows(file, engine='default', grid_dir=None):
+    """iter_sheet_rows に生グリッドのキャッシュを被せたもの。
+
+    grid_dir を渡すと、1回目の解析で全行（末尾の空セルは除く）を「ファイル名.エンジン.内容ハッシュ.grid」に
+    pickle のチャンク列として書き出し、2回目以降は Excel を開かずにそこから読む。
+    キャッシュの読み書きもチャンク単位なので、シート全体をメモリに載せることはない。
+    グリッドが壊れていれば（書きかけ・読めない pickle）消して Excel から読み直し、読めたところの続きから返す。
+    """
+    if grid_dir is None:
+        yield from iter_sheet_rows(file, engine)
+        return
+
+    name = os.path.basename(file)
+    digest = _file_sha256(file)[:16]
+    # エンジンによって日付・数値セルの値の型が違うので、エンジンごとに別のグリッドにする
+    grid_path = os.path.join(grid_dir, f"{name}.{engine}.{digest}.grid")
+    done = 0
+    if os.path.exists(grid_path):
+        with open(grid_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            while f.tell() < size:
+                try:
+                    chunk = pickle.load(f)
+                except Exception:
+                    chunk = None
+                if not isinstance(chunk, list):
+                    break
+                yield from chunk
+                done += len(chunk)
+            else:
+                return
+        os.remove(grid_path)
+
+    os.makedirs(grid_dir, exist_ok=True)
+    tmp_path = f"{grid_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            chunk = []
+            for i, row in enumerate(iter_sheet_rows(file, engine)):
+                chunk.append(_trim(row))
+                if len(chunk) >= GRID_CACHE_CHUNK:
+                    pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    chunk = []
+                if i >= done:
+                    yield row
+            if chunk:
+                pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # 同じワークブックの古い版（内容ハッシュ違い・エンジン名の無い旧形式）のグリッドは消してから差し替える
+        current = {f"{name}.{e}.{digest}.grid" for e in ENGINES}
+        for old in os.listdir(grid_dir):
+            if old.startswith(name + ".") and old.endswith(".grid") and old not in current:
+                os.remove(os.path.join(grid_dir, old))
+        os.replace(tmp_path, grid_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _cell(row, idx):
+    return row[idx] if idx < len(row) else None
+
+
+def _is_blank(value):
+    return value is None or value == ''
+
+
+def read_matching_rows(file, row_filter, rename_map, engine='default', grid_dir=None):
+    """row_filter(row) が真の行について、rename_map の列だけを取り出す。
+
+    戻り値は (総行数, 列数, DataFrame)。総行数と列数は pd.read_excel(header=None) と同じく
+    末尾の空行・空列を除いた大きさで、DataFrame には実在する列だけが rename 済みで入る。
+    """
+    return match_rows(iter_workbook_rows(file, engine, grid_dir), row_filter, rename_map)
+
+
+def match_rows(rows, row_filter, rename_map):
+    """read_matching_rows の本体。読み込み済みの行（iter_workbook_rows の出力）から取り出す。"""
+    wanted = list(rename_map.keys())
+    records = []
+    total_rows = 0
+    width = 0
+
+    for i, row in enumerate(rows):
+        n = len(row)
+        while n > width and _is_blank(row[n - 1]):
+            n -= 1
+        width = max(width, n)
+        if not any(not _is_blank(v) for v in row):
+            continue
+        total_rows = i + 1
+
+        if row_filter(row):
+            records.append(tuple(None if _is_blank(v) else v for v in (_cell(row, c) for c in wanted)))
+
+    existing = [c for c in wanted if c < width]
+    df = pd.DataFrame.from_records(records, columns=wanted)[existing].rename(columns=rename_map)
+    return total_rows, width, df
+
+
+def _is_fatal_record(row):
+    # 死亡DBの絶対座標：インデックス3（左から4番目）に「災害状況」が入っている
+    # 災害状況が空欄ではなく、文字列長が10文字以上の「実データ行」だけを抽出（ヘッダー等のノイズ排除）
+    value = _cell(row, 3)
+    return value is not None and len(str(value)) > 10
+
+
+def _is_target_industry(row):
+    return str(_cell(row, INJURY_INDUSTRY_COL)).strip() == INJURY_TARGET_INDUSTRY
+
+
+def fatal_year(file):
+    """ファイル名の「h25」や「r05」を「年」の値（大文字）にする。見つからなければ "不明"。"""
+    year_match = re.search(r'(h|r)(\d+)', os.path.basename(file), re.IGNORECASE)
+    return year_match.group(0).upper() if year_match else "不明"
+
+
+def finish_fatal_frame(df_valid, file):
+    """死亡DBの抽出結果に、ファイル名から取った「年」と正規化列（時・西暦年・規模区分）を付ける。"""
+    df_valid.insert(0, '年', fatal_year(file))
+    return add_derived_columns(df_valid)
+
+
+def finish_injury_frame(df_valid, file):
+    """死傷DBの抽出結果に正規化列を付ける（年は表の中にあるのでファイル名は使わない）。"""
+    return add_derived_columns(df_valid)
+
+
+def extract_fatal_workbook(file, engine='default', grid_dir=None):
+    """死亡DBの1ファイルを読み込み、実データ行と rename_map の列だけに縮約する。
+
+    戻り値は (状態, 総読み込み行数, DataFrame) で、状態は 'ok' / 'skip' / 'error'。
+    'error' の場合は DataFrame の代わりにエラーメッセージを返す。
+    engine / grid_dir は iter_workbook_rows にそのまま渡す。
+    """
+    try:
+        total_rows, _, df_valid = read_matching_rows(file, _is_fatal_record, FATAL_RENAME_MAP, engine, grid_dir)
+        if df_valid.empty:
+            return 'skip', total_rows, None
+
+        # ファイル名の「年」を先頭列に入れ、時・西暦年・規模区分は後工程で毎回計算し直さないよう、ここで一度だけ付与する
+        return 'ok', total_rows, finish_fatal_frame(df_valid, file)
+
+    except Exception as e:
+        return 'error', 0, str(e)
+
+
+def extract_injury_workbook(file, engine='default', grid_dir=None):
+    """死傷DBの1ファイルを読み込み、対象業種の行と rename_map の列だけに縮約する。
+
+    業種の判定は1行ずつ行い、該当しない行は保持しない（大きな死傷DBでもピークメモリは抽出分のみ）。
+    状態は 'ok' / 'skip' / 'no_column' / 'error'。
+    """
+    try:
+        total_rows, width, mfg_df = read_matching_rows(file, _is_target_industry, INJURY_RENAME_MAP, engine, grid_dir)
+
+        if width <= INJURY_INDUSTRY_COL:
+            return 'no_column', total_rows, None
+        if mfg_df.empty:
+            return 'skip', total_rows, None
+
+        return 'ok', total_rows, finish_injury_frame(mfg_df, file)
+
+    except Exception as e:
+        return 'error', 0, str(e)
+
+
+def iter_extracted(files, extract_func, workers=1):
+    """各ファイルに extract_func を適用し、(ファイル, 結果) を入力順に返す。
+
+    workers が2以上ならファイルごとに別プロセスで解析する。
+    Executor.map は投入順に結果を返すため、結合順は直列実行と同じになる。
+    """
+    if workers <= 1:
+        for file in files:
+            yield file, extract_func(file)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from zip(files, pool.map(extract_func, files))
+
+
+def _file_sha256(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_fingerprint(path, previous=None):
+    """ファイルのパス・サイズ・mtime・内容ハッシュを返す。
+
+    サイズと mtime が前回と同じならハッシュ計算を省略して前回値を引き継ぐ。
+    """
+    st = os.stat(path)
+    fingerprint = {'path': path, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    if previous and previous.get('size') == st.st_size and previous.get('mtime_ns') == st.st_mtime_ns:
+        fingerprint['sha256'] = previous['sha256']
+    else:
+        fingerprint['sha256'] = _file_sha256(path)
+    return fingerprint
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # 壊れたマニフェストは無かったものとして全件作り直す
+        return {}
+
+
+def save_manifest(path, manifest):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _shard_available(cache_dir, entry):
+    if entry.get('status') == 'ok':
+        return os.path.exists(os.path.join(cache_dir, entry.get('shard', '')))
+    return 'status' in entry
+
+
+def refresh_shards(files, extract_func, cache_dir, schema, workers=1, rebuild=False):
+    """新規・変更のあったワークブックだけを解析し、それ以外はキャッシュ済みシャードを使う。
+
+    (ファイル, (状態, 総読み込み行数, 結果), キャッシュ使用有無) を files の順に返す。
+    'ok' の結果は解析直後の DataFrame か、シャードから読み戻した DataFrame。
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    manifest = {} if rebuild else load_manifest(manifest_path)
+    previous = manifest.get('files', {}) if manifest.get('schema_version') == schema else {}
+
+    entries = {}
+    stale_files = []
+    for file in files:
+        name = os.path.basename(file)
+        old = previous.get(name)
+        fingerprint = file_fingerprint(file, old)
+        if old is not None and old.get('sha256') == fingerprint['sha256'] and _shard_available(cache_dir, old):
+            entries[name] = dict(old, **fingerprint)
+        else:
+            entries[name] = fingerprint
+            stale_files.append(file)
+
+    fresh_results = iter_extracted(stale_files, extract_func, workers)
+    stale_names = {os.path.basename(f) for f in stale_files}
+    try:
+        for file in files:
+            name = os.path.basename(file)
+            entry = entries[name]
+
+            if name not in stale_names:
+                result = None
+                if entry['status'] == 'ok':
+                    result = pd.read_pickle(os.path.join(cache_dir, entry['shard']))
+                yield file, (entry['status'], entry['total_rows'], result), True
+                continue
+
+            _, (status, total_rows, result) = next(fresh_results)
+            if status == 'error':
+                # 失敗したファイルは記録せず、次回また解析し直す
+                del entries[name]
+            else:
+                entry.update(status=status, total_rows=total_rows, schema_version=schema)
+                if status == 'ok':
+                    entry['shard'] = name + ".pkl"
+                    entry['valid_rows'] = len(result)
+                    result.to_pickle(os.path.join(cache_dir, entry['shard']))
+            yield file, (status, total_rows, result), False
+    finally:
+        fresh_results.close()
+        # 中断された場合も、解析が済んだ分だけは次回に持ち越す
+        done = {name: entry for name, entry in entries.items() if 'status' in entry}
+        save_manifest(manifest_path, {'schema_version': schema, 'files': done})
+
+        # 入力フォルダから消えたワークブックや解析に失敗したファイルのシャードを掃除する
+        live_shards = {entry.get('shard') for entry in done.values()}
+        for shard in os.listdir(cache_dir):
+            if shard.endswith(".pkl") and shard not in live_shards:
+                os.remove(os.path.join(cache_dir, shard))
@@ -0,0 +1,198 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+# --- 組み込み分析ストア（SQLite） ---
+# マスターと同じレコードを1ファイルのDBに格納し、絞り込みをDB側で行ってから必要な行・列だけを受け取る。
+# record_id はマスター（CSV/Parquet）での行番号と一致させてあり、pandas 側の index とそのまま突き合わせられる。
+STORE_NAME = "accident_store.sqlite"
+STORE_PATH = os.path.join("output", STORE_NAME)
+
+FATAL_TABLE = "sibou"
+INJURY_TABLE = "sisyou"
+
+# 絞り込みに使う列には索引を張る
+INDEX_COLUMNS = [
+    '年',
+    '業種_大分類', '業種_中分類', '業種_小分類',
+    '起因物_大分類', '起因物_中分類', '起因物_小分類',
+    '事故の型'
+]
+
+# SQLite のバインド変数上限（古い版は999）を超えないよう IN 句を分割する
+_IN_CHUNK = 900
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+@contextmanager
+def _connect(db_path, readonly=True):
+    # sqlite3 の with 文はコミットするだけで閉じないため、明示的に閉じる（Windows でのファイルロック対策）
+    if readonly:
+        conn = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def create_store_table(table, columns, db_path=STORE_PATH):
+    """テーブルを空の状態で作り直す。"""
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    with _connect(db_path, readonly=False) as conn:
+        conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+        # record_id を INTEGER PRIMARY KEY（= rowid）にして、ID引きを索引なしで速くする
+        col_defs = ", ".join(f"{_quote(c)}" for c in columns)
+        conn.execute(f"CREATE TABLE {_quote(table)} (record_id INTEGER PRIMARY KEY, {col_defs})")
+    return db_path
+
+
+def append_store(df, table, db_path=STORE_PATH):
+    """df（index = record_id）の行をテーブルに追記する。"""
+    records = df.rename_axis('record_id')
+    with _connect(db_path, readonly=False) as conn:
+        records.to_sql(table, conn, if_exists='append', index=True, chunksize=10000)
+    return db_path
+
+
+def _create_indexes(conn, table):
+    names = [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")]
+    for i, col in enumerate(c for c in INDEX_COLUMNS if c in names):
+        conn.execute(f"CREATE INDEX {_quote(f'idx_{table}_{i}')} ON {_quote(table)} ({_quote(col)})")
+    conn.execute("ANALYZE")
+
+
+def index_store(table, db_path=STORE_PATH):
+    """追記が済んだテーブルの INDEX_COLUMNS に索引を張り、統計を更新する。"""
+    with _connect(db_path, readonly=False) as conn:
+        _create_indexes(conn, table)
+    return db_path
+
+
+def staging_table(table):
+    """ビルダーが追記していく作業用テーブルの名前。マスターの出荷が済むまで本番のテーブルには触れない。"""
+    return f"{table}_staging"
+
+
+def swap_store_table(table, db_path=STORE_PATH):
+    """staging_table(table) に追記し終えた行で table を置き換え、索引を張る。
+
+    旧テーブルの削除・改名・索引の作成を1トランザクションで行うので、途中で止まっても旧テーブルがそのまま残る。
+    """
+    with _connect(db_path, readonly=False) as conn:
+        conn.execute("BEGIN")
+        conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+        conn.execute(f"ALTER TABLE {_quote(staging_table(table))} RENAME TO {_quote(table)}")
+        _create_indexes(conn, table)
+    return db_path
+
+
+def build_store(df, table, db_path=STORE_PATH):
+    """マスターの DataFrame でテーブルを作り直し、INDEX_COLUMNS に索引を張る。"""
+    records = df.reset_index(drop=True)
+    create_store_table(table, records.columns, db_path)
+    append_store(records, table, db_path)
+    return index_store(table, db_path)
+
+
+def store_exists(table=FATAL_TABLE, db_path=STORE_PATH):
+    if not os.path.exists(db_path):
+        return False
+    with _connect(db_path) as conn:
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+    return row is not None
+
+
+def store_columns(columns=None, table=FATAL_TABLE, db_path=STORE_PATH):
+    """テーブルに実在する列名を返す。columns を渡すとそのうち実在するものだけに絞る（古いストア対策）。"""
+    with _connect(db_path) as conn:
+        names = [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")]
+    if columns is None:
+        return names
+    return [c for c in columns if c in names]
+
+
+def _plain(value):
+    # numpy / pandas のスカラーは sqlite3 にそのまま渡せないため Python の値に戻す
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _where(filters):
+    """{列名: 値 または 値のリスト} を WHERE 句とバインド変数に変換する。値が None の条件は無視する。"""
+    clauses, params = [], []
+    for col, value in (filters or {}).items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            values = list(value)
+            if not values:
+                # 空の選択は「該当なし」
+                clauses.append("0")
+                continue
+            clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(values))})")
+            params.extend(_plain(v) for v in values)
+        else:
+            clauses.append(f"{_quote(col)} = ?")
+            params.append(_plain(value))
+    sql = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    return sql, params
+
+
+def _select_list(columns):
+    if not columns:
+        return "*"
+    return ", ".join(["record_id"] + [_quote(c) for c in columns if c != 'record_id'])
+
+
+def query_records(filters=None, columns=None, table=FATAL_TABLE, db_path=STORE_PATH, order_by=None, limit=None):
+    """条件に合うレコードだけを DataFrame（index = record_id）で返す。
+
+    filters は {列名: 値 または 値のリスト}。columns を渡すとその列だけを読む。
+    """
+    where_sql, params = _where(filters)
+    sql = f"SELECT {_select_list(columns)} FROM {_quote(table)}{where_sql}"
+    if order_by:
+        sql += " ORDER BY " + ", ".join(_quote(c) for c in order_by)
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    with _connect(db_path) as conn:
+        return pd.read_sql_query(sql, conn, params=params, index_col='record_id')
+
+
+def count_records(filters=None, table=FATAL_TABLE, db_path=STORE_PATH):
+    where_sql, params = _where(filters)
+    with _connect(db_path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {_quote(table)}{where_sql}", params).fetchone()[0]
+
+
+def fetch_records(record_ids, columns=None, table=FATAL_TABLE, db_path=STORE_PATH):
+    """record_id を指定して行を取り出す（並びは record_ids の順）。"""
+    ids = [int(i) for i in record_ids]
+    if not ids:
+        return pd.DataFrame(columns=columns or []).rename_axis('record_id')
+
+    frames = []
+    with _connect(db_path) as conn:
+        for start in range(0, len(ids), _IN_CHUNK):
+            chunk = ids[start:start + _IN_CHUNK]
+            sql = (f"SELECT {_select_list(columns)} FROM {_quote(table)} "
+                   f"WHERE record_id IN ({', '.join('?' * len(chunk))})")
+            frames.append(pd.read_sql_query(sql, conn, params=chunk, index_col='record_id'))
+    return pd.concat(frames).reindex(ids)
+
+
+def distinct_values(column, filters=None, table=FATAL_TABLE, db_path=STORE_PATH):
+    """条件に合うレコードに現れる column の値を昇順で返す（索引だけで答えられる）。"""
+    where_sql, params = _where(filters)
+    sql = f"SELECT DISTINCT {_quote(column)} FROM {_quote(table)}{where_sql} ORDER BY 1"
+    with _connect(db_path) as conn:
+        return [row[0] for row in conn.execute(sql, params)]
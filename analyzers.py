@@ -0,0 +1,203 @@
+import importlib.util
+from collections import namedtuple
+from importlib import metadata
+
+# --- 形態素解析器の切り替え（Janome / MeCab（fugashi） / Sudachi） ---
+# どの解析器もトークンを Token（表層形・原形・品詞）で返し、品詞は Janome（IPADIC）と同じ
+# 「品詞,品詞細分類1,品詞細分類2,品詞細分類3」の文字列に揃える。
+# MeCab（UniDic）と Sudachi は UniDic 系の品詞体系なので IPADIC の品詞に読み替え、
+# ツール側の品詞の絞り込み（名詞・動詞のうち非自立・代名詞・数・接尾を除く、など）がそのまま効くようにする。
+# 解析器の本体（辞書の読み込み）は最初の tokenize まで作らない。
+#
+# janome  : 純 Python。追加の導入が要らない（既定）
+# mecab   : fugashi + 辞書（unidic-lite / unidic / ipadic のうち入っているもの）
+# sudachi : sudachipy + sudachidict_core など
+ANALYZERS = ['janome', 'mecab', 'sudachi']
+
+# Sudachi の分割単位。IPADIC・UniDic の短い単位に近い A を使う
+SUDACHI_SPLIT_MODE = 'A'
+
+# build_network.py の品詞の絞り込み（原形で数える名詞・動詞と、除外する品詞細分類）
+CONTENT_POS = ('名詞', '動詞')
+EXCLUDED_POS_DETAILS = ('非自立', '代名詞', '数', '接尾')
+
+
+class Token(namedtuple('Token', ['surface', 'base_form', 'part_of_speech'])):
+    """形態素1つ。ツール側は Janome のトークンと同じ属性名で読める。"""
+    __slots__ = ()
+
+    @property
+    def pos(self):
+        return self.part_of_speech.split(',')[0]
+
+    @property
+    def pos_detail(self):
+        return self.part_of_speech.split(',')[1]
+
+
+def content_words(tokens, stop_words=()):
+    """build_network.py と同じ規則で、共起・頻度を数える語（原形）を出現順に返す。"""
+    return [token.base_form for token in tokens
+            if token.pos in CONTENT_POS and token.pos_detail not in EXCLUDED_POS_DETAILS
+            and token.base_form not in stop_words and len(token.base_form) > 1]
+
+
+def _package_version(*names):
+    """names のうち最初に見つかった配布パッケージの (名前, バージョン)。無ければ (None, None)。"""
+    for name in names:
+        try:
+            return name, metadata.version(name)
+        except metadata.PackageNotFoundError:
+            continue
+    return None, None
+
+
+# UniDic の (品詞, 品詞細分類1) → IPADIC の (品詞, 品詞細分類1)。載っていない組はそのまま使う
+_UNIDIC_TO_IPADIC = {
+    ('名詞', '普通名詞'): ('名詞', '一般'),
+    ('名詞', '数詞'): ('名詞', '数'),
+    ('名詞', '助動詞語幹'): ('名詞', '特殊'),
+    ('代名詞', '*'): ('名詞', '代名詞'),
+    ('形状詞', '一般'): ('名詞', '形容動詞語幹'),
+    ('形状詞', 'タリ'): ('名詞', '形容動詞語幹'),
+    ('形状詞', '助動詞語幹'): ('名詞', '特殊'),
+    ('接尾辞', '名詞的'): ('名詞', '接尾'),
+    ('接尾辞', '形状詞的'): ('名詞', '接尾'),
+    ('接尾辞', '動詞的'): ('動詞', '接尾'),
+    ('接尾辞', '形容詞的'): ('形容詞', '接尾'),
+    ('動詞', '一般'): ('動詞', '自立'),
+    ('動詞', '非自立可能'): ('動詞', '自立'),
+    ('形容詞', '一般'): ('形容詞', '自立'),
+    ('形容詞', '非自立可能'): ('形容詞', '自立'),
+    ('接頭辞', '*'): ('接頭詞', '名詞接続'),
+    ('補助記号', '句点'): ('記号', '句点'),
+    ('補助記号', '読点'): ('記号', '読点'),
+    ('補助記号', '括弧開'): ('記号', '括弧開'),
+    ('補助記号', '括弧閉'): ('記号', '括弧閉'),
+    ('補助記号', '一般'): ('記号', '一般'),
+    ('空白', '*'): ('記号', '空白'),
+}
+# 普通名詞は品詞細分類2（サ変可能など）で IPADIC の細分類が決まる
+_UNIDIC_COMMON_NOUN = {'サ変可能': 'サ変接続', 'サ変形状詞可能': 'サ変接続', '副詞可能': '副詞可能',
+                       '形状詞可能': '形容動詞語幹', '助数詞可能': '接尾'}
+
+
+def unidic_to_ipadic(pos1, pos2='*', pos3='*'):
+    """UniDic の品詞を IPADIC 形式の「品詞,細分類1,細分類2,細分類3」の文字列に読み替える。"""
+    pos, detail = _UNIDIC_TO_IPADIC.get((pos1, pos2), (pos1, pos2))
+    sub = '*'
+    if (pos1, pos2) == ('名詞', '普通名詞'):
+        detail = _UNIDIC_COMMON_NOUN.get(pos3, detail)
+    elif (pos1, pos2) == ('名詞', '固有名詞'):
+        sub = pos3  # 人名・地名・一般 は IPADIC と同じ
+    elif pos2 == '助数詞' or pos3 == '助数詞':
+        sub = '助数詞'
+    return f"{pos},{detail},{sub},*"
+
+
+class JanomeAnalyzer:
+    name = 'janome'
+
+    def __init__(self, user_dict=None):
+        self.user_dict = user_dict
+        self._tokenizer = None
+
+    @property
+    def version(self):
+        return _package_version('janome')[1]
+
+    def tokenize(self, text):
+        if self._tokenizer is None:
+            from janome.tokenizer import Tokenizer
+            self._tokenizer = Tokenizer(self.user_dict) if self.user_dict else Tokenizer()
+        return [Token(tok.surface, tok.base_form, tok.part_of_speech) for tok in self._tokenizer.tokenize(text)]
+
+
+class MecabAnalyzer:
+    """fugashi 経由の MeCab。辞書は unidic-lite → unidic → ipadic の順に、入っているものを使う。
+
+    user_dict は MeCab でコンパイル済みのユーザー辞書（.dic）。
+    """
+    name = 'mecab'
+
+    def __init__(self, user_dict=None):
+        self.user_dict = user_dict
+        self._tagger = None
+        self._dictionary = _package_version('unidic-lite', 'unidic', 'ipadic')
+
+    @property
+    def version(self):
+        dic_name, dic_version = self._dictionary
+        return f"{_package_version('fugashi')[1]}-{dic_name}-{dic_version}"
+
+    def _create(self):
+        import fugashi
+
+        args = f"-u {self.user_dict}" if self.user_dict else ""
+        dic_name = self._dictionary[0]
+        if dic_name in ('unidic-lite', 'unidic'):
+            return fugashi.Tagger(args)
+        if dic_name == 'ipadic':
+            import ipadic
+            return fugashi.GenericTagger(f"{ipadic.MECAB_ARGS} {args}")
+        raise RuntimeError("MeCab の辞書が見つかりません（pip install unidic-lite などで導入してください）")
+
+    def tokenize(self, text):
+        if self._tagger is None:
+            self._tagger = self._create()
+        tokens = []
+        for word in self._tagger(text):
+            feature = word.feature
+            if self._dictionary[0] == 'ipadic':
+                # IPADIC: 品詞,細分類1,細分類2,細分類3,活用型,活用形,原形,読み,発音
+                base_form = feature[6] if len(feature) > 6 and feature[6] != '*' else word.surface
+                tokens.append(Token(word.surface, base_form, ",".join(feature[:4])))
+            else:
+                # UniDic の原形は表記を保った orthBase（lemma は漢字表記に正規化されてしまう）
+                base_form = getattr(feature, 'orthBase', None) or word.surface
+                tokens.append(Token(word.surface, base_form,
+                                    unidic_to_ipadic(feature.pos1, feature.pos2, feature.pos3)))
+        return tokens
+
+
+class SudachiAnalyzer:
+    """SudachiPy。分割単位は SUDACHI_SPLIT_MODE。
+
+    user_dict は Sudachi の設定ファイル（userDict にユーザー辞書を書いた sudachi.json）。
+    """
+    name = 'sudachi'
+
+    def __init__(self, user_dict=None):
+        self.user_dict = user_dict
+        self._tokenizer = None
+        self._mode = None
+
+    @property
+    def version(self):
+        dic_name, dic_version = _package_version('sudachidict_core', 'sudachidict_full', 'sudachidict_small')
+        return f"{_package_version('sudachipy')[1]}-{dic_name}-{dic_version}-{SUDACHI_SPLIT_MODE}"
+
+    def tokenize(self, text):
+        if self._tokenizer is None:
+            from sudachipy import Dictionary, SplitMode
+            dictionary = Dictionary(config_path=self.user_dict) if self.user_dict else Dictionary()
+            self._tokenizer = dictionary.create()
+            self._mode = getattr(SplitMode, SUDACHI_SPLIT_MODE)
+        return [Token(m.surface(), m.dictionary_form(), unidic_to_ipadic(*m.part_of_speech()[:3]))
+                for m in self._tokenizer.tokenize(text, self._mode)]
+
+
+_BACKENDS = {'janome': JanomeAnalyzer, 'mecab': MecabAnalyzer, 'sudachi': SudachiAnalyzer}
+_REQUIRED_MODULES = {'janome': ['janome'], 'mecab': ['fugashi'], 'sudachi': ['sudachipy']}
+
+
+def analyzer_available(name):
+    if name == 'mecab' and _package_version('unidic-lite', 'unidic', 'ipadic')[0] is None:
+        return False
+    return all(importlib.util.find_spec(module) is not None for module in _REQUIRED_MODULES[name])
+
+
+def create_analyzer(name='janome', user_dict=None):
+    if name not in _BACKENDS:
+        raise ValueError(f"未対応の形態素解析器です: {name}（{', '.join(ANALYZERS)} から選ぶ）")
+    return _BACKENDS[name](user_dict)
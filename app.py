@@ -1,7 +1,30 @@
+import os
+import time
+import logging
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 
+from accident_store import FATAL_TABLE, INJURY_TABLE, fetch_records, store_exists
+from dashboard_columnar import load_columnar_dataset
+from dashboard_data import (COUNT_COLUMN, cube_totals, keep_record_ids, load_dataset, master_version, normalize_filters,
+                            page_slice, select_rows, sort_rows)
+from dashboard_metrics import METRICS_PATH, RerunMetrics, read_metrics, write_metrics
+from master_store import compact_categories, master_parquet_path, parquet_is_fresh
+from text_index import load_text_index, search, text_index_path
+
+# 操作1回ごと（再実行・一覧表だけの部分再実行）の所要時間をログに残す
+logger = logging.getLogger("dashboard")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s [%(name)s] %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+# 工程別（読み込み / 絞り込み / 集計 / 図の作成 / 一覧表）の時間・件数・キャッシュ命中を記録する
+metrics = RerunMetrics()
+
 # --- 0. 防弾ドア（セキュリティロック） ---
 def check_password():
     def password_entered():
@@ -28,69 +51,104 @@ st.set_page_config(page_title="労災分析ダッシュボード", layout="wide"
 st.title("⚡ 労働災害 統合分析ダッシュボード")
 
 # --- 2. データの読み込みと安全処理 ---
-@st.cache_data
-def load_data():
-    df = pd.read_csv("output/master_sibou_all_industries.csv", encoding='utf-8-sig', low_memory=False)
-    
-    fill_cols = ['起因物_大分類', '起因物_中分類', '起因物_小分類', '事業場規模', '発生時間']
-    for col in fill_cols:
-        if col in df.columns:
-            df[col] = df[col].fillna('不明')
-            
-    df = df.dropna(subset=['年', '月'])
-
-    # --- 【ハイブリッド改修】事業場規模の意味的クレンジング（DBの限界 × 安衛法基準） ---
-    if '事業場規模' in df.columns:
-        def categorize_size(size_str):
-            s = str(size_str).replace(',', '') 
-            
-            # 1. 1〜9人（体制未整備）
-            if s in ['0', '0～9', '1～9']:
-                return '① 9人以下（安全衛生推進者 選任義務なし）'
-            
-            # 2. 10〜49人（推進者選任）
-            elif s in ['10～19', '10～29', '20～29', '30～39', '30～49', '40～49']:
-                return '② 10～49人（安全衛生推進者 選任義務）'
-            
-            # 3. 50〜299人（衛生管理者・産業医）
-            # ※衛生管理者の増員ライン(200人)は生データの「100～299」を分割できないためここで統合
-            elif s in ['50～99', '100～299']:
-                return '③ 50～299人（衛生管理者・産業医 選任義務）'
-                
-            # 4. 300〜999人（製造業等で総括安全衛生管理者）
-            elif s in ['300～499', '300～', '500～999']:
-                return '④ 300～999人（製造業等で 総括安全衛生管理者）'
-                
-            # 5. 1000人以上（全業種で総括・専属産業医）
-            elif s in ['1000～9999', '10000～']:
-                return '⑤ 1000人以上（専属産業医・全業種で総括）'
-                
-            else:
-                return '⑥ 不明・その他'
-                
-        df['事業場規模'] = df['事業場規模'].apply(categorize_size)
-
-    return df
-
-df = load_data()
+# 絞り込み・集計に使う列（災害状況の長文は組み込みストアがあれば一覧表示の分だけ後から取り寄せる）
+FILTER_COLUMNS = [
+    '年', '西暦年', '月', '発生時間', '事業場規模', '事業場規模_区分',
+    '業種_大分類', '業種_中分類', '業種_小分類',
+    '起因物_大分類', '起因物_中分類', '起因物_小分類', '事故の型'
+]
+USE_STORE = store_exists()
+
+MASTER_CSV = "output/master_sibou_all_industries.csv"
+# 死傷DB（build_master_db.py）はメモリに載せず、型付きParquetをディスク上で問い合わせる
+INJURY_CSV = "output/master_sisyou_貨物取扱業_detailed.csv"
+# サイドバーで絞り込む列（値ごとのビットマップ索引を作る）
+INDEXED_COLUMNS = ['業種_大分類', '業種_中分類', '業種_小分類', '年', '月', '発生時間', '事業場規模']
+INDUSTRY_HIERARCHY = ['業種_大分類', '業種_中分類', '業種_小分類']
+
+@st.cache_resource(max_entries=1)
+def load_data(version, use_store):
+    # データ・索引・集計キューブはサーバープロセスで1つだけ持ち、全セッションがコピーせずに共有する（読み取り専用）
+    # version（マスターのサイズと更新時刻）が変われば作り直すので、ビルダーで再構築すれば再起動なしで反映される
+    # 型付きParquetがあればそちらを優先し、CSVしか無くても低カーディナリティの列は Categorical にする
+    return load_dataset(MASTER_CSV, FILTER_COLUMNS if use_store else None, INDEXED_COLUMNS, INDUSTRY_HIERARCHY)
+
+@st.cache_resource(max_entries=1)
+def load_injury_data(version):
+    # 全件は読まず、選択肢の一覧と行グループの位置だけを持つ（絞り込み・集計のたびに必要な列だけを読む）
+    return load_columnar_dataset(INJURY_CSV, INDEXED_COLUMNS, INDUSTRY_HIERARCHY, table=INJURY_TABLE)
+
+# 一覧表の並び順（表示名 -> (並べ替える列, 降順か)）
+# 年は元号表記（'H30' と 'R01' など）で文字の順では時系列にならないため、取り込み時に求めた西暦年で並べる
+SORT_OPTIONS = {
+    "元の順": ([], False),
+    "年・月の古い順": (['西暦年', '月'], False),
+    "年・月の新しい順": (['西暦年', '月'], True),
+}
+
+# 一覧表に出す列
+TABLE_COLUMNS = ['年', '月', '発生時間', '事業場規模', '業種_小分類', '起因物_小分類', '事故の型']
+CAUSE_PATH = ['起因物_大分類', '起因物_中分類', '起因物_小分類']
+
+def load_keyword_index(table):
+    # 災害状況の全文索引（text_index.py）。プロセス内で1回だけ読み、ファイルが更新されたときだけ読み直す
+    # 索引は2-gramの転置リストだけで本文は持たない（形式の古い索引は None になり、検索欄で作り直しを促す）
+    path = text_index_path(table)
+    return load_text_index(path) if os.path.exists(path) else None
+
+# 死傷DBの Parquet があるときだけ、データセットを切り替えられるようにする
+DATASETS = {"死亡災害": FATAL_TABLE}
+if parquet_is_fresh(master_parquet_path(INJURY_CSV), INJURY_CSV):
+    DATASETS["死傷災害"] = INJURY_TABLE
+dataset_label = st.sidebar.radio("データセット", list(DATASETS), horizontal=True) if len(DATASETS) > 1 else "死亡災害"
+table_name = DATASETS[dataset_label]
+
+with metrics.stage('load') as stage:
+    if table_name == INJURY_TABLE:
+        dataset = load_injury_data(master_version(INJURY_CSV))
+        stage['rows'] = dataset['columnar'].n
+    else:
+        dataset = load_data(master_version(MASTER_CSV), USE_STORE)
+        stage['rows'] = len(dataset['df'])
+    # この再実行より前に作られていればキャッシュ命中
+    stage['cache_hit'] = dataset['loaded_at'] < metrics.started_at
+# columnar があるデータセット（死傷）は、df / 索引 / キューブを持たずにディスク上で問い合わせる
+columnar = dataset.get('columnar')
+df = dataset['df']
+filter_index = dataset.get('filter_index')
+cube, cube_index = dataset.get('cube'), dataset.get('cube_index')
+options = dataset['options']
+
+def sort_option(label):
+    # 西暦年 の無い古いマスターでは、従来どおり 年 で並べる
+    by, descending = SORT_OPTIONS[label]
+    names = columnar.column_names if columnar is not None else df.columns
+    return ['年' if col == '西暦年' and col not in names else col for col in by], descending
+
+def keyword_texts(record_ids):
+    # 全文索引は本文を持たないので、フレーズ照合する候補の災害状況だけをストア / Parquet / df から取り寄せる
+    if columnar is not None:
+        return columnar.fetch_page(record_ids, ['災害状況'])['災害状況']
+    if USE_STORE:
+        return fetch_records(record_ids, columns=['災害状況'])['災害状況']
+    return df['災害状況'].reindex(record_ids)
 
 # --- 3. サイドバー（全方位フィルター設定） ---
 st.sidebar.header("🔍 フィルター設定")
 
 st.sidebar.subheader("🏢 業種")
-industry_l_list = ["すべて"] + sorted(df['業種_大分類'].unique().tolist())
+# 選択肢はデータの版ごとに作成済みのものを使う（再実行のたびに unique / sort しない）
+industry_l_list = ["すべて"] + options['業種_大分類']
 selected_l = st.sidebar.selectbox("業種（大分類）", industry_l_list)
 
 if selected_l != "すべて":
-    df_m = df[df['業種_大分類'] == selected_l]
-    industry_m_list = ["すべて"] + sorted(df_m['業種_中分類'].unique().tolist())
+    industry_m_list = ["すべて"] + options['children'].get((selected_l,), [])
 else:
     industry_m_list = ["すべて"]
 selected_m = st.sidebar.selectbox("業種（中分類）", industry_m_list)
 
 if selected_m != "すべて":
-    df_s = df_m[df_m['業種_中分類'] == selected_m]
-    industry_s_list = ["すべて"] + sorted(df_s['業種_小分類'].unique().tolist())
+    industry_s_list = ["すべて"] + options['children'].get((selected_l, selected_m), [])
 else:
     industry_s_list = ["すべて"]
 selected_s = st.sidebar.selectbox("業種（小分類）", industry_s_list)
@@ -98,75 +156,200 @@ selected_s = st.sidebar.selectbox("業種（小分類）", industry_s_list)
 st.sidebar.markdown("---")
 
 st.sidebar.subheader("⏱ 発生状況・規模")
-year_list = sorted(df['年'].unique().tolist())
+year_list = options['年']
 selected_years = st.sidebar.multiselect("発生年", year_list, default=year_list)
 
-month_list = sorted(df['月'].unique().tolist())
+month_list = options['月']
 selected_months = st.sidebar.multiselect("発生月", month_list, default=month_list)
 
-time_list = sorted(df['発生時間'].unique().tolist())
+time_list = options['発生時間']
 selected_times = st.sidebar.multiselect("発生時間帯", time_list, default=time_list)
 
-size_list = sorted(df['事業場規模'].unique().tolist())
+size_list = options['事業場規模']
 selected_sizes = st.sidebar.multiselect("事業場規模", size_list, default=size_list)
 
 # --- 4. 空間のフィルタリング（階層的な絞り込み） ---
-filtered_df = df.copy()
+# 条件はビットマップの AND / OR で解決し、最後に該当行だけを取り出す（全件コピーや列ごとの比較はしない）
+# 複数選択を全て外した場合は従来通り「その条件では絞り込まない」
+filters = {
+    '業種_大分類': None if selected_l == "すべて" else selected_l,
+    '業種_中分類': None if selected_m == "すべて" else selected_m,
+    '業種_小分類': None if selected_s == "すべて" else selected_s,
+    '年': selected_years or None,
+    '月': selected_months or None,
+    '発生時間': selected_times or None,
+    '事業場規模': selected_sizes or None,
+}
 
-if selected_l != "すべて":
-    filtered_df = filtered_df[filtered_df['業種_大分類'] == selected_l]
-if selected_m != "すべて":
-    filtered_df = filtered_df[filtered_df['業種_中分類'] == selected_m]
-if selected_s != "すべて":
-    filtered_df = filtered_df[filtered_df['業種_小分類'] == selected_s]
-
-if selected_years:
-    filtered_df = filtered_df[filtered_df['年'].isin(selected_years)]
-if selected_months:
-    filtered_df = filtered_df[filtered_df['月'].isin(selected_months)]
-if selected_times:
-    filtered_df = filtered_df[filtered_df['発生時間'].isin(selected_times)]
-if selected_sizes:
-    filtered_df = filtered_df[filtered_df['事業場規模'].isin(selected_sizes)]
+def build_bar_figure(type_counts):
+    fig_bar = px.bar(type_counts, x='件数', y='事故の型', orientation='h', color='件数', color_continuous_scale='Reds', text='件数')
+    fig_bar.update_traces(textposition='outside')
+    fig_bar.update_layout(
+        yaxis={'categoryorder':'total ascending'},
+        xaxis=dict(showgrid=True, gridcolor='lightgray'),
+        plot_bgcolor='white',
+        margin=dict(l=0, r=0, t=30, b=0)
+    ) 
+    return fig_bar
+
+def build_sunburst_figure(sunburst_df, cause_path):
+    fig_sunburst = px.sunburst(
+        sunburst_df, 
+        path=cause_path, 
+        values=COUNT_COLUMN,
+        color_discrete_sequence=px.colors.sequential.Reds_r
+    )
+    fig_sunburst.update_traces(textinfo="label+percent parent")
+    fig_sunburst.update_layout(margin=dict(l=0, r=0, t=30, b=0))
+    return fig_sunburst
+
+def compute_view():
+    if columnar is not None:
+        # 死傷DB: 必要な列だけを行グループ単位で読み、件数と2つの集計を1回の走査で求める
+        rows = None
+        with metrics.stage('scan') as stage:
+            n_rows, (type_totals, cause_totals) = columnar.summarize(filters, ['事故の型', CAUSE_PATH])
+            stage['rows'] = n_rows
+        if n_rows == 0:
+            return {'rows': rows, 'n': 0}
+    else:
+        with metrics.stage('filter') as stage:
+            rows = select_rows(filter_index, filters)
+            stage['rows'] = n_rows = len(rows)
+        if n_rows == 0:
+            return {'rows': rows, 'n': 0}
+        with metrics.stage('aggregate') as stage:
+            # グラフは生の行ではなく、条件に合うキューブのセルから集計する
+            cube_rows = select_rows(cube_index, filters)
+            type_totals = cube_totals(cube, cube_rows, '事故の型')
+            cause_totals = cube_totals(cube, cube_rows, CAUSE_PATH)
+            stage['rows'] = len(cube_rows)
+
+    type_counts = type_totals[type_totals > 0].reset_index()  # Categorical の0件カテゴリを除外
+    type_counts.columns = ['事故の型', '件数']
+    # 生の行ではなく、起因物の3階層ごとに合計済みの件数を渡す
+    # Categorical のままだと未使用カテゴリの空ノードが混ざるため、描画前に詰める
+    sunburst_df = compact_categories(cause_totals.reset_index())
+    with metrics.stage('figures') as stage:
+        figures = {
+            'fig_bar': build_bar_figure(type_counts),
+            'fig_sunburst': build_sunburst_figure(sunburst_df, CAUSE_PATH),
+        }
+        stage['rows'] = len(type_counts) + len(sunburst_df)
+    return {'rows': rows, 'n': n_rows, **figures}
+
+# 同じ条件の組み合わせ（選択順は問わない）なら、行番号と図をキャッシュから使い回す
+# キャッシュに無いときだけ compute_view の中で filter / aggregate / figures が記録される
+with metrics.stage('view_cache') as stage:
+    view, view_cached = dataset['views'].get(normalize_filters(options, filters), compute_view)
+    stage['rows'] = view['n']
+    stage['cache_hit'] = view_cached
+filtered_rows, n_filtered = view['rows'], view['n']
 
 # --- 5. メイン画面の描画（グラフの生成） ---
-st.markdown(f"### 現在の抽出件数: {len(filtered_df)} 件")
+st.markdown(f"### 現在の抽出件数: {n_filtered} 件")
 
+chart_start = time.perf_counter()
 col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("📊 事故の型（何が起きたか）")
-    if not filtered_df.empty:
-        type_counts = filtered_df['事故の型'].value_counts().reset_index()
-        type_counts.columns = ['事故の型', '件数']
-        
-        fig_bar = px.bar(type_counts, x='件数', y='事故の型', orientation='h', color='件数', color_continuous_scale='Reds', text='件数')
-        fig_bar.update_traces(textposition='outside')
-        fig_bar.update_layout(
-            yaxis={'categoryorder':'total ascending'},
-            xaxis=dict(showgrid=True, gridcolor='lightgray'),
-            plot_bgcolor='white',
-            margin=dict(l=0, r=0, t=30, b=0)
-        ) 
-        st.plotly_chart(fig_bar, width="stretch")
+    if n_filtered:
+        st.plotly_chart(view['fig_bar'], width="stretch")
     else:
         st.info("条件に一致するデータがありません。")
 
 with col2:
     st.subheader("🎯 起因物（大→中→小 クリックでドリルダウン）")
-    if not filtered_df.empty:
-        fig_sunburst = px.sunburst(
-            filtered_df, 
-            path=['起因物_大分類', '起因物_中分類', '起因物_小分類'], 
-            color_discrete_sequence=px.colors.sequential.Reds_r
-        )
-        fig_sunburst.update_traces(textinfo="label+percent parent")
-        fig_sunburst.update_layout(margin=dict(l=0, r=0, t=30, b=0))
-        st.plotly_chart(fig_sunburst, width="stretch")
+    if n_filtered:
+        st.plotly_chart(view['fig_sunburst'], width="stretch")
     else:
         st.info("条件に一致するデータがありません。")
 
+metrics.record('render_charts', time.perf_counter() - chart_start, rows=n_filtered)
+
 st.markdown("---")
-st.subheader("📋 抽出データ一覧（災害状況の確認）")
-if not filtered_df.empty:
-    st.dataframe(filtered_df[['年', '月', '発生時間', '事業場規模', '業種_小分類', '起因物_小分類', '事故の型', '災害状況']].head(100))
\ No newline at end of file
+# 一覧表は部分再実行（fragment）にし、検索・並べ替え・ページ送りではグラフや絞り込みをやり直さない
+@st.fragment
+def render_table():
+    table_metrics = RerunMetrics('table')
+    fragment_start = time.perf_counter()
+    table_rows, table_cached = [], None
+    st.subheader("📋 抽出データ一覧（災害状況の確認）")
+    if n_filtered:
+        # 表示するページの行だけを取り出す（絞り込み結果の全件を画面に送らない）
+        table_col1, table_col2, table_col3 = st.columns([3, 2, 1])
+        keyword = table_col1.text_input("災害状況のキーワード検索（空白=AND, OR=または, \"...\"=フレーズ）", "").strip()
+        sort_label = table_col2.selectbox("並び順", list(SORT_OPTIONS))
+        page_size = table_col3.selectbox("表示件数", [50, 100, 200], index=1)
+
+        text_index = load_keyword_index(table_name)
+        if keyword and text_index is None and (columnar is not None or '災害状況' not in df.columns):
+            builder = "build_master_db.py" if table_name == INJURY_TABLE else "build_fatal_db.py"
+            st.warning(f"全文索引が見つからない（または形式が古い）ため、キーワード検索は使えません（{builder} を実行してください）。")
+            keyword = ""
+
+        def compute_table_rows():
+            if columnar is not None:
+                # 並べ替えてから検索で絞る（record_id = 行の位置なので全文索引の結果とそのまま照合できる）
+                rows = columnar.select_rows(filters, *sort_option(sort_label))
+                return rows[np.isin(rows, search(text_index, keyword, keyword_texts))] if keyword else rows
+            rows = filtered_rows
+            if keyword:
+                if text_index is not None:
+                    rows = keep_record_ids(df, rows, search(text_index, keyword, keyword_texts))
+                else:
+                    rows = rows[df['災害状況'].take(rows).str.contains(keyword, regex=False, na=False).to_numpy()]
+            by, descending = sort_option(sort_label)
+            return sort_rows(df, rows, by, descending)
+
+        # 検索・並べ替えの結果（行の位置）も、絞り込み条件と合わせたキーで使い回す
+        table_key = ('table', table_name, normalize_filters(options, filters), keyword, sort_label)
+        table_rows, table_cached = dataset['views'].get(table_key, compute_table_rows)
+
+        n_pages = max(1, -(-len(table_rows) // page_size))
+        # 条件や表示件数が変わったら1ページ目に戻す（ウィジェットの key を変える）
+        page = st.number_input(f"ページ（全 {n_pages} ページ / {len(table_rows)} 件）", min_value=1, max_value=n_pages, value=1,
+                               key=f"page_{hash((table_key, page_size))}")
+        page_rows = page_slice(table_rows, int(page), page_size)
+
+        if columnar is not None:
+            table_df = columnar.fetch_page(page_rows, TABLE_COLUMNS + ['災害状況'])
+        elif USE_STORE:
+            table_df = df.take(page_rows)[TABLE_COLUMNS]
+            # 表示するページ分の災害状況だけを record_id でストアから取り寄せる
+            table_df = table_df.join(fetch_records(table_df.index, columns=['災害状況']))
+        else:
+            table_df = df.take(page_rows)[TABLE_COLUMNS].join(df['災害状況'])
+        st.dataframe(table_df)
+    table_metrics.record('table', time.perf_counter() - fragment_start, rows=len(table_rows), cache_hit=table_cached)
+    if metrics.finished:
+        # 一覧表だけの部分再実行（ページ送り・検索など）は、別レコードとして記録する
+        record = table_metrics.finish(rows=n_filtered)
+        write_metrics(record)
+        logger.info("一覧表の操作: %.1f ms (表示 %d 件)", record['total_ms'], len(table_rows))
+    else:
+        metrics.extend(table_metrics)
+
+render_table()
+
+cache_stats = dataset['views'].stats()
+st.caption(f"表示キャッシュ: {'ヒット' if view_cached else 'ミス'} "
+           f"(累計 ヒット {cache_stats['hits']} / ミス {cache_stats['misses']}, "
+           f"{cache_stats['entries']}件 {cache_stats['nbytes'] / 1024 ** 2:.1f} / {cache_stats['max_bytes'] / 1024 ** 2:.0f} MB)")
+
+record = metrics.finish(rows=n_filtered, view_cache_hit=view_cached)
+write_metrics(record)
+logger.info("再実行: %.1f ms (抽出 %d 件, 表示キャッシュ: %s) %s", record['total_ms'], n_filtered,
+            'ヒット' if view_cached else 'ミス', " ".join(f"{s['stage']}={s['ms']:.0f}" for s in record['stages']))
+
+# 管理者向けの処理時間パネル（URL に ?admin=1 を付けたときだけ表示）
+if st.query_params.get("admin") == "1":
+    with st.expander("⚙ 処理時間の内訳（管理者向け）"):
+        st.markdown(f"**今回の再実行: {record['total_ms']:.0f} ms**（抽出 {record['rows']} 件）")
+        st.dataframe(pd.DataFrame(record['stages']), hide_index=True)
+        history = pd.DataFrame([r for r in read_metrics(limit=500) if r.get('kind') == 'rerun'])
+        if len(history):
+            totals = history['total_ms']
+            st.caption(f"直近 {len(history)} 回の再実行: 中央値 {totals.median():.0f} ms / "
+                       f"p95 {totals.quantile(0.95):.0f} ms / 最大 {totals.max():.0f} ms（記録: {os.path.abspath(METRICS_PATH)}）")
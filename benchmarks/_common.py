@@ -0,0 +1,24 @@
+import os
+import sys
+
+# --- ベンチマーク共通の小道具 ---
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def peak_rss_mb():
+    """このプロセスの起動からのピークRSS（MB）。
+
+    POSIX は getrusage の ru_maxrss（Linux は KB、macOS はバイト単位）、Windows は psutil の peak_wset を使う。
+    psutil の rss は「今の」使用量でピークではないため、Windows 以外では使わない。
+    """
+    if sys.platform == 'win32':
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1024 ** 2
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024
+
+
+def child_code(body):
+    """python -c で別プロセスに渡す計測コードに、peak_rss_mb を import する前置きを付ける。"""
+    return f"import sys\nsys.path.insert(0, {BENCH_DIR!r})\nfrom _common import peak_rss_mb\n{body}"
@@ -0,0 +1,107 @@
+import os
+import sys
+import glob
+import time
+import argparse
+from collections import Counter
+
+# --- 形態素解析器（Janome / MeCab / Sudachi）の速度と結果の一致度の比較 ---
+# 事故コーパス（災害状況1件 = 1テキスト）を各解析器でキャッシュを通さず直列に解析し、
+# 辞書の読み込み時間・トークン/秒と、基準の解析器（既定 Janome）に対する一致度を報告する。
+#   境界一致 : 単語の切れ目（空白を除いた文字位置）の F1
+#   抽出語一致: build_network.py と同じ品詞の絞り込みで残る語（原形）の F1（件ごとの多重集合で数える）
+# 導入されていない解析器は飛ばす。
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from analyzers import ANALYZERS, analyzer_available, content_words, create_analyzer
+
+
+def load_corpus(text_paths, master_path, limit):
+    """マスターの災害状況か、テキスト出力（空行区切りで1件ずつ）を読む。"""
+    if master_path:
+        from master_store import load_master
+        texts = load_master(master_path, columns=['災害状況'])['災害状況'].dropna().astype(str).tolist()
+    else:
+        texts = []
+        for path in text_paths:
+            with open(path, encoding='utf-8') as f:
+                texts.extend(line.strip() for line in f if line.strip())
+    return texts[:limit] if limit else texts
+
+
+def boundaries(tokens):
+    """空白を除いた文字列での単語の終わりの位置の集合（空白の扱いが違う解析器どうしでも比べられる）。"""
+    ends, position = set(), 0
+    for token in tokens:
+        length = len("".join(token.surface.split()))
+        if length:
+            position += length
+            ends.add(position)
+    return ends
+
+
+def f1(matched, n_test, n_reference):
+    return 2 * matched / (n_test + n_reference) if n_test + n_reference else 1.0
+
+
+def agreement(results, reference):
+    matched_b = n_b = n_ref_b = 0
+    matched_w = n_w = n_ref_w = 0
+    for tokens, ref_tokens in zip(results, reference):
+        b, ref_b = boundaries(tokens), boundaries(ref_tokens)
+        matched_b += len(b & ref_b)
+        n_b, n_ref_b = n_b + len(b), n_ref_b + len(ref_b)
+        w, ref_w = Counter(content_words(tokens)), Counter(content_words(ref_tokens))
+        matched_w += sum((w & ref_w).values())
+        n_w, n_ref_w = n_w + sum(w.values()), n_ref_w + sum(ref_w.values())
+    return f1(matched_b, n_b, n_ref_b), f1(matched_w, n_w, n_ref_w)
+
+
+def measure(name, texts):
+    analyzer = create_analyzer(name)
+    start = time.perf_counter()
+    analyzer.tokenize("辞書の読み込み")
+    load_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    results = [analyzer.tokenize(text) for text in texts]
+    return load_seconds, time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="形態素解析器ごとの速度と、基準の解析器との一致度を測る")
+    parser.add_argument("--analyzers", nargs="+", default=ANALYZERS, choices=ANALYZERS, help="比べる解析器")
+    parser.add_argument("--reference", default="janome", choices=ANALYZERS, help="一致度の基準にする解析器")
+    parser.add_argument("--text", nargs="+", default=sorted(glob.glob(os.path.join(ROOT_DIR, "input", "input_*.txt"))),
+                        help="災害状況のテキスト出力（既定: input/input_*.txt）")
+    parser.add_argument("--master", help="マスター（CSV/Parquet）の災害状況を使う場合のパス（--text より優先）")
+    parser.add_argument("--limit", type=int, help="解析する件数の上限")
+    args = parser.parse_args()
+
+    texts = load_corpus(args.text, args.master, args.limit)
+    if not texts:
+        print("[異常終了] 解析するテキストがありません。--text か --master を指定してください。")
+        sys.exit(1)
+    names = [args.reference] + [n for n in args.analyzers if n != args.reference]
+    print(f"--- 形態素解析器の比較: {len(texts):,} 件 / {sum(map(len, texts)):,} 文字（基準: {args.reference}） ---")
+
+    print(f"{'解析器':<10}{'読込(秒)':>10}{'解析(秒)':>10}{'トークン/秒':>14}{'境界一致':>10}{'抽出語一致':>12}")
+    reference = None
+    for name in names:
+        if not analyzer_available(name):
+            print(f"{name:<10}[スキップ] 導入されていません")
+            continue
+        load_seconds, seconds, results = measure(name, texts)
+        n_tokens = sum(map(len, results))
+        if reference is None and name == args.reference:
+            reference = results
+        if reference is not None:
+            boundary_f1, word_f1 = agreement(results, reference)
+            match = f"{boundary_f1:>10.1%}{word_f1:>12.1%}"
+        else:
+            match = f"{'-':>10}{'-':>12}"
+        print(f"{name:<10}{load_seconds:>10.2f}{seconds:>10.2f}{n_tokens / seconds:>14,.0f}{match}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from _common import peak_rss_mb
+
+# --- ダッシュボード（app.py）の負荷試験: N 個の独立したプロセスで同時に操作する（ブラウザ不要） ---
+# Streamlit のテスト API（AppTest）で分析者1人 = 1セッションを模擬し、同時に走らせる。
+# 各分析者は業種の絞り込み・年月や規模の選択・キーワード検索・並べ替え・ページ送りを乱数で組み合わせて操作し、
+# 操作1回（再実行1回）ごとの所要時間のパーセンタイルと、プロセスのメモリ（RSS）を報告する。
+# AppTest は実行のたびにプロセス全体の Runtime を作り直すため、同じプロセスのスレッドでは並行に動かせない。
+# そこで分析者ごとに別プロセスとし、データの読み込みは計測前の予行で済ませてから一斉に操作を始める。
+# 注意: これは「N 人が1台の streamlit run サーバーを共有する」状況の計測ではない。
+# 各プロセスがデータ（st.cache_resource）とビューのキャッシュを別々に持つため、キャッシュの共有による効果も、
+# 1プロセス内での GIL の取り合いも現れない。結果は CPU を取り合う N 個の独立したセッションの応答時間として読み、
+# メモリは1プロセスあたりの値だけを示す（合計しても実サーバーの使用量にはならない）。
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+APP_PATH = os.path.join(ROOT_DIR, "app.py")
+MASTER_NAME = "master_sibou_all_industries.csv"
+
+KEYWORDS = ['墜落', 'フォークリフト', 'はさまれ', '足場 転落', '"巻き込まれ"', '']
+# 操作の種類と出現の重み（サイドバーの絞り込みが多く、一覧表の操作がそれに続く想定）
+ACTIONS = {
+    'industry': 4, 'drilldown': 3, 'years': 3, 'months': 1, 'sizes': 2, 'reset': 1,
+    'keyword': 2, 'sort': 1, 'page': 2,
+}
+
+
+def quiet_logs():
+    # 再実行ごとのコンソールログは計測の邪魔になるので止める（metrics ファイルへの記録は残る）
+    dashboard_logger = logging.getLogger("dashboard")
+    dashboard_logger.addHandler(logging.NullHandler())
+    dashboard_logger.setLevel(logging.WARNING)
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+
+def prepare_master(work_dir, rows, seed, regenerate):
+    """合成ワークブックを生成し build_fatal_db.py でマスター（CSV・Parquet・ストア・全文索引）を作る。"""
+    output_dir = os.path.join(work_dir, "output")
+    if os.path.exists(os.path.join(output_dir, MASTER_NAME)) and not regenerate:
+        return
+    from generate_synthetic_db import generate
+    input_dir = os.path.join(work_dir, "input")
+    print(f"--- 合成マスターの作成（{rows:,} 行） ---")
+    generate('sibou', rows, input_dir, seed=seed)
+    subprocess.run([sys.executable, os.path.join(ROOT_DIR, "build_fatal_db.py"), "--rebuild",
+                    "--input-dir", input_dir, "--output-dir", output_dir],
+                   cwd=ROOT_DIR, check=True, stdout=subprocess.DEVNULL)
+
+
+def new_session(timeout):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.session_state['password_correct'] = True  # パスワード画面は通過済みとして始める
+    return at
+
+
+def apply_action(at, action, rng):
+    """操作を1つ行う（ウィジェットに値を入れて再実行する）。行えない操作なら None を返す。"""
+    industry_l, industry_m = at.sidebar.selectbox[0], at.sidebar.selectbox[1]
+    years, months, _, sizes = at.sidebar.multiselect
+    if action == 'industry':
+        industry_l.set_value(rng.choice(industry_l.options))
+    elif action == 'drilldown':
+        # 中分類が選べるなら中分類を、選び済みなら小分類を選ぶ
+        target = industry_m if industry_m.value == "すべて" else at.sidebar.selectbox[2]
+        if len(target.options) < 2:
+            return None
+        target.set_value(rng.choice(target.options[1:]))
+    elif action == 'years':
+        years.set_value(rng.sample(years.options, rng.randint(1, len(years.options))))
+    elif action == 'months':
+        months.set_value(rng.sample(months.options, rng.randint(1, len(months.options))))
+    elif action == 'sizes':
+        sizes.set_value(rng.sample(sizes.options, rng.randint(1, len(sizes.options))))
+    elif action == 'reset':
+        industry_l.set_value("すべて")
+        years.set_value(years.options)
+        months.set_value(months.options)
+        sizes.set_value(sizes.options)
+    elif not len(at.text_input):
+        return None  # 抽出0件で一覧表の操作が出ていない
+    elif action == 'keyword':
+        at.text_input[0].input(rng.choice(KEYWORDS))
+    elif action == 'sort':
+        at.selectbox[0].set_value(rng.choice(at.selectbox[0].options))
+    elif action == 'page':
+        page = at.number_input[0]
+        if page.max is not None and page.value >= page.max:
+            return None
+        page.increment()
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"{action}: {at.exception[0].value}")
+    return action
+
+
+def run_analyst(user_id, steps, seed, think, timeout, work_dir, barrier):
+    """分析者1人分の操作列を実行し、操作ごとの所要時間とプロセスのピークRSSを返す（ワーカープロセスで動く）。"""
+    # app.py は output/ を相対パスで読むため、合成マスターのフォルダで動かす
+    os.chdir(work_dir)
+    quiet_logs()
+    rng = random.Random(seed + user_id)
+    names, weights = list(ACTIONS), list(ACTIONS.values())
+    timings = []
+    try:
+        # 予行: データ・索引の読み込み（st.cache_resource）をこのプロセスで済ませておく
+        new_session(timeout).run()
+        loaded_rss = peak_rss_mb()
+        barrier.wait()
+    except Exception as e:
+        barrier.abort()
+        return {'timings': timings, 'loaded_rss_mb': None, 'peak_rss_mb': peak_rss_mb(), 'error': str(e)}
+
+    error = None
+    try:
+        at = new_session(timeout)
+        start = time.perf_counter()
+        at.run()  # 新しいセッションの最初の表示
+        timings.append(('open', time.perf_counter() - start))
+        for _ in range(steps):
+            if think:
+                time.sleep(rng.uniform(0, think * 2))
+            action = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            done = apply_action(at, action, rng)
+            if done:
+                timings.append((done, time.perf_counter() - start))
+    except Exception as e:  # 1人の失敗で全体を止めず、最後にまとめて報告する
+        error = str(e)
+    return {'timings': timings, 'loaded_rss_mb': loaded_rss, 'peak_rss_mb': peak_rss_mb(), 'error': error}
+
+
+def percentiles(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {'n': len(ms), 'p50': float(np.percentile(ms, 50)), 'p90': float(np.percentile(ms, 90)),
+            'p95': float(np.percentile(ms, 95)), 'p99': float(np.percentile(ms, 99)), 'max': float(ms.max())}
+
+
+def run_load(users, steps, seed, think, timeout, work_dir):
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=users) as pool:
+        barrier = manager.Barrier(users)
+        futures = [pool.submit(run_analyst, i, steps, seed, think, timeout, work_dir, barrier) for i in range(users)]
+        start = time.perf_counter()
+        analysts = [f.result() for f in futures]
+        # 予行の分も含むので、経過時間は全員が揃ってからの操作時間で近似する
+        elapsed = max(sum(sec for _, sec in a['timings']) for a in analysts) or time.perf_counter() - start
+
+    timings = [t for a in analysts for t in a['timings']]
+    by_action = {}
+    for action, sec in timings:
+        by_action.setdefault(action, []).append(sec)
+    loaded = [a['loaded_rss_mb'] for a in analysts if a['loaded_rss_mb'] is not None]
+    return {
+        'users': users,
+        'interactions': len(timings),
+        'seconds': elapsed,
+        'throughput': len(timings) / elapsed if elapsed else 0.0,
+        'all': percentiles([sec for _, sec in timings]) if timings else None,
+        'actions': {action: percentiles(secs) for action, secs in sorted(by_action.items())},
+        'loaded_rss_mb': max(loaded) if loaded else None,
+        'peak_rss_mb': max(a['peak_rss_mb'] for a in analysts),
+        'errors': [f"analyst {i}: {a['error']}" for i, a in enumerate(analysts) if a['error']],
+    }
+
+
+def print_result(r):
+    print(f"\n--- 独立した {r['users']} プロセスで同時操作: {r['interactions']} 操作 / {r['seconds']:.1f}秒 "
+          f"({r['throughput']:.1f} 操作/秒) ---")
+    if r['loaded_rss_mb'] is not None:
+        print(f"メモリ（1プロセスあたり）: 読み込み後 {r['loaded_rss_mb']:.0f} MB -> ピーク {r['peak_rss_mb']:.0f} MB")
+    print(f"{'操作':<12}{'回数':>6}{'p50(ms)':>10}{'p90(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'最大(ms)':>10}")
+    rows = list(r['actions'].items()) + ([('(全体)', r['all'])] if r['all'] else [])
+    for action, p in rows:
+        print(f"{action:<12}{p['n']:>6}{p['p50']:>10.0f}{p['p90']:>10.0f}{p['p95']:>10.0f}{p['p99']:>10.0f}{p['max']:>10.0f}")
+    for error in r['errors']:
+        print(f"[エラー] {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="app.py を N 個の独立したプロセスで同時に操作し、操作ごとの応答時間とメモリを測る")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 20, 50], help="同時に操作するプロセス数（複数指定で順に計測）")
+    parser.add_argument("--steps", type=int, default=20, help="1人あたりの操作回数")
+    parser.add_argument("--think", type=float, default=0.0, help="操作の間の平均待ち時間（秒）")
+    parser.add_argument("--rows", type=int, default=50_000, help="合成マスターの行数")
+    parser.add_argument("--work-dir", default=os.path.join(ROOT_DIR, "bench_data", "dashboard"),
+                        help="合成マスター（output/）を置くフォルダ")
+    parser.add_argument("--regenerate", action="store_true", help="合成マスターを作り直す")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=300, help="再実行1回のタイムアウト（秒）")
+    parser.add_argument("--json", help="結果を JSON で保存するパス")
+    args = parser.parse_args()
+    prepare_master(args.work_dir, args.rows, args.seed, args.regenerate)
+
+    results = []
+    for users in args.users:
+        result = run_load(users, args.steps, args.seed, args.think, args.timeout, os.path.abspath(args.work_dir))
+        print_result(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n[指示] 計測結果を保存しました: {os.path.abspath(args.json)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+
+from _common import child_code
+
+# --- 取り込みパイプライン（build_fatal_db.py / build_master_db.py）のベンチマーク ---
+# 1) 端から端まで: ビルダーを別プロセスで実行し、所要時間とピークRSSを測る
+# 2) 工程別: 読み込み / 行の絞り込みと列の縮約 / 年・正規化列の付与 / 書き出し（マスター・ストア・索引）を個別に計測する
+#    各工程はビルダーと同じ accident_ingest の関数（iter_workbook_rows → match_rows → finish_*_frame）をそのまま呼ぶ
+# 入力は generate_synthetic_db.py で作った合成ワークブックを想定（--generate で自動生成）
+# 合成データは xlwt があれば最も古い年度を .xls で書くので、xlrd での読み込みも計測に入る（--engine default のとき）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from accident_ingest import (ENGINES, FATAL_COLUMNS, FATAL_RENAME_MAP, INJURY_COLUMNS, INJURY_RENAME_MAP, _is_fatal_record,
+                             _is_target_industry, finish_fatal_frame, finish_injury_frame, iter_workbook_rows, match_rows,
+                             resolve_engine)
+from accident_store import append_store, create_store_table, staging_table, swap_store_table
+from master_store import MasterWriter
+from text_index import add_texts, finish_text_index, new_text_index, save_text_index, text_index_spill_dir
+
+BUILDERS = {
+    'sibou': ("build_fatal_db.py", _is_fatal_record, FATAL_RENAME_MAP, FATAL_COLUMNS, finish_fatal_frame),
+    'sisyou': ("build_master_db.py", _is_target_industry, INJURY_RENAME_MAP, INJURY_COLUMNS, finish_injury_frame),
+}
+STAGES = ['read', 'match', 'derive', 'write_master', 'write_store', 'write_text_index']
+
+# 子プロセスでビルダーを実行し、終了時のピークRSSを JSON で返す
+CHILD_CODE = child_code(r"""
+import os, sys, json, runpy, time
+
+script = sys.argv[1]
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(script))
+start = time.perf_counter()
+with open(os.devnull, 'w') as devnull:
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+        runpy.run_path(script, run_name='__main__')
+    finally:
+        sys.stdout = stdout
+print(json.dumps({'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb()}))
+""")
+
+
+def run_end_to_end(kind, input_dir, output_dir, workers, engine):
+    script = os.path.join(ROOT_DIR, BUILDERS[kind][0])
+    cmd = [sys.executable, "-c", CHILD_CODE, script, "--rebuild", "--workers", str(workers), "--engine", engine,
+           "--input-dir", input_dir, "--output-dir", output_dir]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True, cwd=ROOT_DIR)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+class StageTimer:
+    """工程ごとの経過時間と（--memory 指定時は）tracemalloc のピークを積算する。"""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.seconds = {}
+        self.peak_mb = {}
+
+    def run(self, stage, func, *args):
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + time.perf_counter() - start
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+                tracemalloc.stop()
+                self.peak_mb[stage] = max(self.peak_mb.get(stage, 0.0), peak)
+
+
+def run_stages(kind, files, output_dir, engine='default', trace_memory=False):
+    """ビルダーの処理を工程に分解して計測する（キャッシュは使わず毎回解析する）。
+
+    書き出しはビルダーと同じくワークブックごとの追記で、マスター / ストア / 全文索引を別々に計る。
+    """
+    _, row_filter, rename_map, columns, finish_frame = BUILDERS[kind]
+    timer = StageTimer(trace_memory)
+    total_rows = 0
+    valid_rows = 0
+
+    writer = MasterWriter(os.path.join(output_dir, f"bench_{kind}.csv"), columns)
+    store_path = os.path.join(output_dir, "bench_store.sqlite")
+    text_index = new_text_index(spill_dir=text_index_spill_dir(f"bench_{kind}", output_dir))
+    timer.run('write_store', create_store_table, staging_table(kind), columns, store_path)
+
+    for file in files:
+        rows = timer.run('read', lambda: list(iter_workbook_rows(file, engine)))
+        file_rows, _, df = timer.run('match', match_rows, rows, row_filter, rename_map)
+        total_rows += file_rows
+        del rows
+        if df.empty:
+            continue  # ビルダーと同じく、該当行の無いファイルは書き出さない
+        df = timer.run('derive', finish_frame, df, file)
+
+        records = timer.run('write_master', writer.append, df)
+        timer.run('write_store', append_store, records, staging_table(kind), store_path)
+        timer.run('write_text_index', add_texts, text_index, records['災害状況'])
+        valid_rows += len(records)
+
+    timer.run('write_master', writer.close)
+    timer.run('write_store', swap_store_table, kind, store_path)
+    timer.run('write_text_index', lambda: save_text_index(finish_text_index(text_index),
+                                                          os.path.join(output_dir, f"bench_index_{kind}.pkl")))
+    return {'total_rows': total_rows, 'valid_rows': valid_rows, 'seconds': timer.seconds, 'peak_mb': timer.peak_mb}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="死亡/死傷DBビルダーの所要時間とメモリを計測する")
+    parser.add_argument("--kind", choices=['sibou', 'sisyou', 'both'], default='both')
+    parser.add_argument("--input-dir", default=os.path.join(ROOT_DIR, "bench_data", "input"),
+                        help="合成ワークブックのフォルダ")
+    parser.add_argument("--generate", type=int, metavar="ROWS",
+                        help="計測前に ROWS 行の合成ワークブックを --input-dir に作り直す")
+    parser.add_argument("--workers", type=int, default=1, help="端から端までの計測で使うワーカー数")
+    parser.add_argument("--engine", choices=ENGINES, default="auto", help="Excelの読み込みエンジン")
+    parser.add_argument("--skip-stages", action="store_true", help="工程別の計測を省略する")
+    parser.add_argument("--memory", action="store_true",
+                        help="工程別に tracemalloc でピークを測る（計測自体が遅くなる）")
+    parser.add_argument("--json", help="結果を JSON で保存するパス")
+    args = parser.parse_args()
+
+    kinds = ['sibou', 'sisyou'] if args.kind == 'both' else [args.kind]
+    if args.generate:
+        from generate_synthetic_db import generate
+        shutil.rmtree(args.input_dir, ignore_errors=True)
+        for kind in kinds:
+            generate(kind, args.generate, args.input_dir)
+
+    results = {}
+    for kind in kinds:
+        files = sorted(f for f in os.listdir(args.input_dir) if f.startswith(f"{kind}_db_")) \
+            if os.path.isdir(args.input_dir) else []
+        if not files:
+            print(f"[スキップ] {kind}_db_*.xls* が {args.input_dir} にありません（--generate で作成できます）")
+            continue
+        files = [os.path.join(args.input_dir, f) for f in files]
+        size_mb = sum(os.path.getsize(f) for f in files) / 1024 ** 2
+        n_xls = sum(f.endswith(".xls") for f in files)
+        print(f"\n--- {kind}: {len(files)}ファイル（うち .xls {n_xls}） / {size_mb:.1f} MB ---")
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            e2e = run_end_to_end(kind, args.input_dir, output_dir, args.workers, args.engine)
+            print(f"端から端まで: {e2e['seconds']:.2f}秒 / ピークRSS {e2e['peak_rss_mb']:.1f} MB "
+                  f"(ワーカー数: {args.workers} / エンジン: {resolve_engine(args.engine)})")
+            result = {'files': len(files), 'input_mb': size_mb, 'end_to_end': e2e}
+
+            if not args.skip_stages:
+                stages = run_stages(kind, files, output_dir, resolve_engine(args.engine), args.memory)
+                print(f"総読み込み行数: {stages['total_rows']:,} 行 / 抽出: {stages['valid_rows']:,} 件")
+                print(f"{'工程':<18}{'秒':>10}{'割合':>8}" + (f"{'ピーク(MB)':>12}" if args.memory else ""))
+                total = sum(stages['seconds'].values())
+                for stage in STAGES:
+                    sec = stages['seconds'].get(stage, 0.0)
+                    line = f"{stage:<18}{sec:>10.2f}{sec / total:>8.0%}"
+                    if args.memory:
+                        line += f"{stages['peak_mb'].get(stage, 0.0):>12.1f}"
+                    print(line)
+                result['stages'] = stages
+        results[kind] = result
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n[指示] 計測結果を保存しました: {os.path.abspath(args.json)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from _common import child_code
+
+# --- ダッシュボードの load_data（起動時の読み込み）の時間とメモリの比較計測 ---
+# 従来版: CSVを object 列のまま読み、事業場規模を1行ずつの categorize_size（.apply）で区分する
+# 現行版: dashboard_data.load_dashboard_frame（型付きParquet優先・Categorical・早見表での一括区分）
+# 計測ごとに別プロセスを起動し、ピークRSSが前の計測に引きずられないようにする
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CSV = os.path.join(ROOT_DIR, "output", "master_sibou_all_industries.csv")
+
+CHILD_CODE = child_code(r"""
+import os, sys, json, time
+import pandas as pd
+
+mode, path, root = sys.argv[1], sys.argv[2], sys.argv[3]
+sys.path.insert(0, root)
+from master_store import SIZE_BUCKETS, SIZE_UNKNOWN, master_parquet_path, parquet_is_fresh
+
+def legacy_load(path):
+    df = pd.read_csv(path, encoding='utf-8-sig', low_memory=False)
+    for col in ['起因物_大分類', '起因物_中分類', '起因物_小分類', '事業場規模', '発生時間']:
+        if col in df.columns:
+            df[col] = df[col].fillna('不明')
+    df = df.dropna(subset=['年', '月'])
+    def categorize_size(size_str):
+        return SIZE_BUCKETS.get(str(size_str).replace(',', ''), SIZE_UNKNOWN)
+    df['事業場規模'] = df['事業場規模'].apply(categorize_size)
+    return df
+
+baseline = peak_rss_mb()
+start = time.perf_counter()
+if mode == 'legacy':
+    df = legacy_load(path)
+    source = 'csv'
+else:
+    from dashboard_data import load_dashboard_frame
+    df = load_dashboard_frame(path)
+    source = 'parquet' if parquet_is_fresh(master_parquet_path(path), path) else 'csv'
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'rows': len(df),
+    'source': source,
+    'frame_mb': df.memory_usage(deep=True).sum() / 1024 ** 2,
+    'peak_rss_mb': peak_rss_mb(),
+    'baseline_rss_mb': baseline,
+}))
+""")
+
+
+def measure(mode, path, repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", CHILD_CODE, mode, path, ROOT_DIR],
+                             capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    # 時間は最速値、メモリは最大値を採用する
+    best = min(runs, key=lambda r: r['seconds'])
+    best['peak_rss_mb'] = max(r['peak_rss_mb'] for r in runs)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ダッシュボードの load_data（従来版 vs 現行版）の読み込みコスト比較")
+    parser.add_argument("--csv", default=DEFAULT_CSV, help="マスターCSV（同名の .parquet があれば現行版はそちらを読む）")
+    parser.add_argument("--repeat", type=int, default=3, help="各版の計測回数")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.csv):
+        print(f"[異常終了] 計測対象が見つかりません: {args.csv}")
+        print("-> 先に build_fatal_db.py を実行してください。")
+        sys.exit(1)
+
+    print(f"--- load_data ベンチマーク（{args.repeat}回計測） ---")
+    results = {mode: measure(mode, args.csv, args.repeat) for mode in ('legacy', 'current')}
+
+    print(f"{'版':<10}{'読込元':>9}{'行数':>10}{'読込(秒)':>10}{'DataFrame(MB)':>15}{'ピークRSS(MB)':>15}")
+    for mode, r in results.items():
+        print(f"{mode:<10}{r['source']:>9}{r['rows']:>10}{r['seconds']:>10.2f}{r['frame_mb']:>15.1f}{r['peak_rss_mb']:>15.1f}")
+
+    old, new = results['legacy'], results['current']
+    print(f"\n読込時間: {old['seconds'] / new['seconds']:.1f}倍速 / "
+          f"DataFrameメモリ: {new['frame_mb'] / old['frame_mb']:.0%} / "
+          f"ピークRSS: {new['peak_rss_mb'] / old['peak_rss_mb']:.0%}（現行版 ÷ 従来版）")
+
+
+if __name__ == "__main__":
+    main()
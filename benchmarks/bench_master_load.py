@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from _common import child_code
+
+# --- マスターの読み込み速度とメモリ（CSV vs 型付きParquet）の比較計測 ---
+# 計測ごとに別プロセスを起動し、ピークRSSが前の計測に引きずられないようにする
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CSV = os.path.join(ROOT_DIR, "output", "master_sibou_all_industries.csv")
+
+CHILD_CODE = child_code(r"""
+import os, sys, json, time
+import pandas as pd
+
+fmt, path = sys.argv[1], sys.argv[2]
+baseline = peak_rss_mb()
+start = time.perf_counter()
+if fmt == 'csv':
+    df = pd.read_csv(path, encoding='utf-8-sig', low_memory=False)
+else:
+    df = pd.read_parquet(path)
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'rows': len(df),
+    'frame_mb': df.memory_usage(deep=True).sum() / 1024 ** 2,
+    'peak_rss_mb': peak_rss_mb(),
+    'baseline_rss_mb': baseline,
+}))
+""")
+
+
+def measure(fmt, path, repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", CHILD_CODE, fmt, path],
+                             capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    # 時間は最速値、メモリは最大値を採用する
+    best = min(runs, key=lambda r: r['seconds'])
+    best['peak_rss_mb'] = max(r['peak_rss_mb'] for r in runs)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="マスターCSVと型付きParquetの読み込みコスト比較")
+    parser.add_argument("--csv", default=DEFAULT_CSV, help="比較対象のマスターCSV（同名の .parquet と比べる）")
+    parser.add_argument("--repeat", type=int, default=3, help="各形式の計測回数")
+    args = parser.parse_args()
+
+    parquet_path = os.path.splitext(args.csv)[0] + ".parquet"
+    targets = [('csv', args.csv), ('parquet', parquet_path)]
+    missing = [p for _, p in targets if not os.path.exists(p)]
+    if missing:
+        print(f"[異常終了] 計測対象が見つかりません: {missing}")
+        print("-> 先に build_fatal_db.py（pyarrow 導入済みの環境）を実行してください。")
+        sys.exit(1)
+
+    print(f"--- マスター読み込みベンチマーク（{args.repeat}回計測） ---")
+    results = {fmt: measure(fmt, path, args.repeat) for fmt, path in targets}
+
+    print(f"{'形式':<8}{'ファイル(MB)':>14}{'読込(秒)':>10}{'DataFrame(MB)':>15}{'ピークRSS(MB)':>15}")
+    for fmt, path in targets:
+        r = results[fmt]
+        size_mb = os.path.getsize(path) / 1024 ** 2
+        print(f"{fmt:<8}{size_mb:>14.1f}{r['seconds']:>10.2f}{r['frame_mb']:>15.1f}{r['peak_rss_mb']:>15.1f}")
+
+    csv_r, pq_r = results['csv'], results['parquet']
+    print(f"\n読込時間: {csv_r['seconds'] / pq_r['seconds']:.1f}倍速 / "
+          f"DataFrameメモリ: {pq_r['frame_mb'] / csv_r['frame_mb']:.0%} / "
+          f"ピークRSS: {pq_r['peak_rss_mb'] / csv_r['peak_rss_mb']:.0%}（Parquet ÷ CSV）")
+
+
+if __name__ == "__main__":
+    main()
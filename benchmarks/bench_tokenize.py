@@ -0,0 +1,69 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import tempfile
+
+# --- 形態素解析の並列化（TokenCache の workers）の速度計測 ---
+# 同じコーパスをワーカー数を変えて解析し、所要時間・トークン/秒・1並列に対する速度向上を報告する。
+# 計測ごとに空のキャッシュフォルダを使うので、毎回すべてを解析し直す。
+# 結果が1並列のときと完全に一致することも確かめる（分け方はワーカー数によらず同じ）。
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from token_cache import TokenCache
+
+
+def load_corpus(text_paths, master_path, limit):
+    """白書などのテキストファイル（1ファイル = 1テキスト）か、マスターの災害状況（1件 = 1テキスト）を読む。"""
+    if master_path:
+        from master_store import load_master
+        texts = load_master(master_path, columns=['災害状況'])['災害状況'].dropna().astype(str).tolist()
+    else:
+        texts = []
+        for path in text_paths:
+            with open(path, encoding='utf-8') as f:
+                texts.append(f.read())
+    return texts[:limit] if limit else texts
+
+
+def measure(texts, workers):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        tokens = TokenCache(cache_dir, workers=workers).tokenize_many(texts)
+        return time.perf_counter() - start, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description="形態素解析のワーカー数ごとの速度を測る")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="ワーカー数（複数指定で順に計測）")
+    parser.add_argument("--text", nargs="+", default=sorted(glob.glob(os.path.join(ROOT_DIR, "input", "*.txt"))),
+                        help="解析するテキストファイル（既定: input/*.txt）")
+    parser.add_argument("--master", help="マスター（CSV/Parquet）の災害状況を解析する場合のパス（--text より優先）")
+    parser.add_argument("--limit", type=int, help="解析するテキスト数の上限")
+    args = parser.parse_args()
+
+    texts = load_corpus(args.text, args.master, args.limit)
+    if not texts:
+        print("[異常終了] 解析するテキストがありません。--text か --master を指定してください。")
+        sys.exit(1)
+    print(f"--- 形態素解析の並列化ベンチマーク: {len(texts):,} テキスト / {sum(map(len, texts)):,} 文字 "
+          f"（CPU {os.cpu_count()} コア） ---")
+
+    print(f"{'並列数':>6}{'時間(秒)':>10}{'トークン/秒':>14}{'速度向上':>10}{'効率':>8}  結果")
+    # 速度向上と結果の一致は1並列（直列）の計測を基準にする
+    workers_list = [1] + [w for w in args.workers if w != 1]
+    baseline_seconds, baseline_tokens = None, None
+    for workers in workers_list:
+        seconds, tokens = measure(texts, workers)
+        n_tokens = sum(map(len, tokens))
+        if baseline_seconds is None:
+            baseline_seconds, baseline_tokens = seconds, tokens
+        speedup = baseline_seconds / seconds
+        same = "一致" if tokens == baseline_tokens else "不一致"
+        print(f"{workers:>6}{seconds:>10.2f}{n_tokens / seconds:>14,.0f}{speedup:>9.1f}x{speedup / workers:>8.0%}  {same}")
+
+
+if __name__ == "__main__":
+    main()
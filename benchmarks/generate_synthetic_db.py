@@ -0,0 +1,194 @@
+import os
+import sys
+import math
+import random
+import argparse
+import importlib.util
+
+# --- 合成の労災ワークブック生成器（0_old/create_data.py の発展版） ---
+# 本物の厚労省DBは共有できないため、ビルダーが期待する「絶対座標」の列配置だけを再現した
+# sibou_db_*.xlsx / sisyou_db_*.xlsx を任意の行数で書き出す。ベンチマークや動作確認用。
+# 実DBの古い年度は .xls で配られているので、xlwt があれば古い年度から xls_files 個を .xls で書き、
+# ビルダーの xlrd（default エンジン）での読み込みも通す。xlwt が無ければ全て .xlsx になる。
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from accident_ingest import FATAL_RENAME_MAP, INJURY_INDUSTRY_COL, INJURY_RENAME_MAP, INJURY_TARGET_INDUSTRY
+from master_store import SIZE_BUCKETS
+
+# xlsx の1シートの上限（1,048,576行）に余裕を持たせた1ファイルあたりの最大行数
+MAX_ROWS_PER_FILE = 1_000_000
+# .xls（BIFF8）の1シートの上限。タイトル行と見出し行の2行を除いた行数まで .xls にできる
+XLS_MAX_ROWS = 65_536 - 2
+
+ERAS = ['h24', 'h25', 'h26', 'h27', 'h28', 'h29', 'h30', 'r01', 'r02', 'r03', 'r04', 'r05', 'r06']
+
+INDUSTRIES = {
+    '製造業': {'食料品製造業': ['食料品製造業', 'パン・菓子製造業'], '金属製品製造業': ['金属製品製造業', 'めっき業'],
+             '一般機械器具製造業': ['一般機械器具製造業', '金属加工機械製造業']},
+    '建設業': {'土木工事業': ['河川土木工事業', '道路建設工事業'], '建築工事業': ['木造家屋建築工事業', '鉄骨・鉄筋コンクリート造家屋建築工事業']},
+    '運輸交通業': {'道路貨物運送業': ['一般貨物自動車運送業', '特定貨物自動車運送業']},
+    '貨物取扱業': {'港湾運送業': ['港湾荷役業', '沿岸荷役業'], '陸上貨物取扱業': ['陸上貨物取扱業']},
+    '商業': {'卸売業': ['各種商品卸売業'], '小売業': ['各種商品小売業', '飲食料品小売業']},
+}
+CAUSES = {
+    '機械等': {'一般動力機械': ['食品加工用機械', '混合機、粉砕機', 'ロール機'], '動力運搬機': ['フォークリフト', 'トラック', 'コンベア'],
+             '建設機械等': ['掘削用機械', '移動式クレーン']},
+    '仮設物、建築物、構築物等': {'足場': ['足場'], '階段、桟橋': ['階段、桟橋'], '屋根、はり、もや、けた、合掌': ['屋根']},
+    '物質、材料': {'材料': ['金属材料', '木材、竹材'], '危険物、有害物等': ['有害物']},
+    'その他': {'その他の起因物': ['その他の起因物'], '起因物なし': ['起因物なし']},
+}
+ACCIDENT_TYPES = ['墜落、転落', '転倒', '激突', '飛来、落下', '崩壊、倒壊', '激突され', 'はさまれ、巻き込まれ',
+                  '切れ、こすれ', '交通事故（道路）', '動作の反動、無理な動作', 'その他']
+SIZES = list(SIZE_BUCKETS) + ['不明']
+HOURS = [f"{h}～{h + 1}" for h in range(24)] + ['不明', '8～7']
+
+SUBJECTS = ['被災者は', '作業者が', '同僚と2人で', '派遣労働者が', '運転手が']
+OBJECTS = ['フォークリフト', '回転するロール', 'トラックの荷台', '足場', '移動式クレーンの吊り荷', 'コンベア', '屋根']
+ACTIONS = ['に手を巻き込まれた', 'の下敷きになった', 'から墜落した', 'に挟まれた', 'と激突した', 'の清掃中に転落した']
+ENDINGS = ['。病院に搬送されたが死亡した。', '。頭部を強打し休業した。', '。骨折により休業4日以上となった。']
+
+
+def _pick_hierarchy(rng, tree):
+    large = rng.choice(list(tree))
+    middle = rng.choice(list(tree[large]))
+    return large, middle, rng.choice(tree[large][middle])
+
+
+def _narrative(rng):
+    # 災害状況は「10文字超」が実データ行の判定条件なので、必ずそれより長い文にする
+    return (f"{rng.choice(SUBJECTS)}{rng.choice(OBJECTS)}の点検作業中、"
+            f"{rng.choice(OBJECTS)}{rng.choice(ACTIONS)}{rng.choice(ENDINGS)}")
+
+
+def _blank_row(rename_map):
+    return [None] * (max(rename_map) + 1)
+
+
+def fatal_row(rng):
+    row = _blank_row(FATAL_RENAME_MAP)
+    ind = _pick_hierarchy(rng, INDUSTRIES)
+    cause = _pick_hierarchy(rng, CAUSES)
+    row[1] = rng.randint(1, 12)
+    row[2] = rng.choice(HOURS)
+    row[3] = _narrative(rng)
+    row[5], row[7], row[9] = ind
+    row[10] = rng.choice(SIZES)
+    row[12], row[14], row[16] = cause
+    row[18] = rng.choice(ACCIDENT_TYPES)
+    return row
+
+
+def injury_row(rng, year, target_ratio):
+    row = _blank_row(INJURY_RENAME_MAP)
+    ind = _pick_hierarchy(rng, INDUSTRIES)
+    if rng.random() < target_ratio:
+        large = INJURY_TARGET_INDUSTRY
+        middle = rng.choice(list(INDUSTRIES[large]))
+        ind = (large, middle, rng.choice(INDUSTRIES[large][middle]))
+    cause = _pick_hierarchy(rng, CAUSES)
+    row[2] = year
+    row[3] = rng.randint(1, 12)
+    row[4] = rng.choice(HOURS)
+    row[5] = _narrative(rng)
+    row[INJURY_INDUSTRY_COL], row[9], row[11] = ind
+    row[12] = rng.choice(SIZES)
+    row[14], row[16], row[18] = cause
+    row[20] = rng.choice(ACCIDENT_TYPES)
+    row[21] = rng.randint(16, 80)
+    return row
+
+
+def _era_to_year(era):
+    return (1988 if era[0] == 'h' else 2018) + int(era[1:])
+
+
+def xlwt_available():
+    return importlib.util.find_spec("xlwt") is not None
+
+
+def write_xls_workbook(path, rows_iter, n_rows, width):
+    # xlwt は全行をメモリに持ってから書くが、.xls は XLS_MAX_ROWS 行までなので問題にならない
+    import xlwt
+    wb = xlwt.Workbook(encoding='utf-8')
+    ws = wb.add_sheet("Sheet1")
+    ws.write(0, 0, "（合成データ）労働災害データベース")
+    for i in range(width):
+        ws.write(1, i, f"列{i}")
+    for r in range(n_rows):
+        for c, value in enumerate(next(rows_iter)):
+            if value is not None:
+                ws.write(r + 2, c, value)
+    wb.save(path)
+
+
+def write_workbook(path, rows_iter, n_rows, width):
+    # write_only モードなら行を逐次書き出すため、500万行規模でもメモリを食わない
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    # 実ファイル同様、先頭にタイトル行と見出し行（ノイズ）を置く
+    ws.append(["（合成データ）労働災害データベース"])
+    ws.append([f"列{i}" for i in range(width)])
+    for _ in range(n_rows):
+        ws.append(next(rows_iter))
+    wb.save(path)
+
+
+def plan_files(total_rows, min_files):
+    n_files = max(min_files, math.ceil(total_rows / MAX_ROWS_PER_FILE))
+    base, extra = divmod(total_rows, n_files)
+    return [base + (1 if i < extra else 0) for i in range(n_files)]
+
+
+def file_name(kind, index, ext=".xlsx"):
+    # 年ごとに1ファイル。年数より多く分割する場合は _p2, _p3 ... の枝番を付ける
+    era = ERAS[index % len(ERAS)]
+    part = index // len(ERAS)
+    return f"{kind}_db_{era}{'' if part == 0 else f'_p{part + 1}'}{ext}", era
+
+
+def generate(kind, total_rows, out_dir, min_files=len(ERAS), seed=42, target_ratio=0.1, xls_files=1):
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    written = []
+    if xls_files and not xlwt_available():
+        print("  [通知] xlwt が無いため .xls は作らず、すべて .xlsx で書き出します（xlrd での読み込みは通りません）。")
+        xls_files = 0
+    for i, n_rows in enumerate(plan_files(total_rows, min_files)):
+        # 古い年度から xls_files 個を .xls にする（1シートに収まらない行数なら .xlsx のまま）
+        as_xls = i < xls_files and n_rows <= XLS_MAX_ROWS
+        name, era = file_name(kind, i, ".xls" if as_xls else ".xlsx")
+        path = os.path.join(out_dir, name)
+        if kind == 'sibou':
+            rows = iter(lambda: fatal_row(rng), None)
+            width = max(FATAL_RENAME_MAP) + 1
+        else:
+            year = _era_to_year(era)
+            rows = iter(lambda: injury_row(rng, year, target_ratio), None)
+            width = max(INJURY_RENAME_MAP) + 1
+        (write_xls_workbook if as_xls else write_workbook)(path, rows, n_rows, width)
+        written.append((path, n_rows))
+        print(f"  └ [OK] {name} ({n_rows:,} 行)")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成の死亡/死傷災害ワークブックを生成する")
+    parser.add_argument("--kind", choices=['sibou', 'sisyou', 'both'], default='both')
+    parser.add_argument("--rows", type=int, default=10_000, help="データセットあたりの総行数（1万〜500万）")
+    parser.add_argument("--files", type=int, default=len(ERAS), help="最低ファイル数（年の数。行数が多ければ自動で増える）")
+    parser.add_argument("--target-ratio", type=float, default=0.1, help=f"死傷DBで「{INJURY_TARGET_INDUSTRY}」にする行の割合")
+    parser.add_argument("--xls-files", type=int, default=1,
+                        help=f".xls で書く古い年度のファイル数（xlwt が必要。{XLS_MAX_ROWS:,} 行を超えるファイルは .xlsx）")
+    parser.add_argument("--out-dir", default=os.path.join(ROOT_DIR, "bench_data", "input"))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    kinds = ['sibou', 'sisyou'] if args.kind == 'both' else [args.kind]
+    for kind in kinds:
+        print(f"--- 合成 {kind}_db の生成: 計 {args.rows:,} 行 -> {args.out_dir} ---")
+        generate(kind, args.rows, args.out_dir, args.files, args.seed, args.target_ratio, args.xls_files)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,84 +1,121 @@
 import os
 import glob
-import pandas as pd
+import argparse
+import functools
 import time
-import warnings
 
-# --- 1. 安全装置と空間設計 ---
-warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
-warnings.filterwarnings('ignore', category=UserWarning, module='xlrd')
+from accident_ingest import (ENGINES, INJURY_COLUMNS, INJURY_SCHEMA_VERSION, calamine_available,
+                             extract_injury_workbook, grid_cache_dir,
+                             refresh_shards, resolve_engine, shard_cache_dir)
+from accident_store import (INJURY_TABLE, STORE_NAME, append_store, create_store_table, staging_table,
+                            swap_store_table)
+from master_store import MasterWriter
+from text_index import (add_texts, finish_text_index, new_text_index, save_text_index, text_index_path,
+                        text_index_spill_dir)
 
+# --- 1. 空間設計 ---
 INPUT_DIR = "input"
 OUTPUT_DIR = "output"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-TARGET_FILES = glob.glob(os.path.join(INPUT_DIR, "sisyou_db_*.xls*"))
-OUTPUT_CSV = os.path.join(OUTPUT_DIR, "master_sisyou_貨物取扱業_detailed.csv") # 出力ファイル名を変更
-
-print(f"--- 第1工程：労災データベース（詳細分類追加版）の統合を開始 ---")
-print(f"発見されたパレット（ファイル）数: {len(TARGET_FILES)}件\n")
-
-all_data = []
-total_rows = 0
-mfg_rows = 0
-
-start_time = time.time()
-
-# --- 2. 絶対座標抽出コンベア（中分類・小分類拡張） ---
-for file in TARGET_FILES:
-    filename = os.path.basename(file)
-    print(f"[{filename}] を投入中...", end="")
-
-    try:
-        df = pd.read_excel(file, header=None)
-        total_rows += len(df)
-
-        if 7 in df.columns:
-            mfg_df = df[df[7].astype(str).str.strip() == '貨物取扱業'].copy()
-            
-            if not mfg_df.empty:
-                # 【中核の改修】中分類・小分類の座標（9, 11, 16, 18）を追加
-                rename_map = {
-                    2: '年', 
-                    3: '月', 
-                    4: '発生時間', 
-                    5: '災害状況', 
-                    7: '業種_大分類', 
-                    9: '業種_中分類',
-                    11: '業種_小分類',
-                    12: '事業場規模', 
-                    14: '起因物_大分類', 
-                    16: '起因物_中分類',
-                    18: '起因物_小分類',
-                    20: '事故の型', 
-                    21: '年齢'
-                }
-                
-                existing_cols = [c for c in rename_map.keys() if c in mfg_df.columns]
-                mfg_df = mfg_df[existing_cols]
-                mfg_df.rename(columns=rename_map, inplace=True)
-                
-                all_data.append(mfg_df)
-                mfg_rows += len(mfg_df)
-                print(f" -> 抽出完了（赤のコア: {len(mfg_df)}件）")
-            else:
+OUTPUT_CSV_NAME = "master_sisyou_貨物取扱業_detailed.csv" # 出力ファイル名を変更
+
+
+def main():
+    parser = argparse.ArgumentParser(description="労災データベース（詳細分類追加版）の統合")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="ワークブックを並列解析するプロセス数（1なら従来通り直列）")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="キャッシュ済みシャードを使わず全ワークブックを解析し直す")
+    parser.add_argument("--engine", choices=ENGINES, default="auto",
+                        help="Excelの読み込みエンジン（auto: calamine があれば使う / default: openpyxl・xlrd）")
+    parser.add_argument("--grid-cache", action="store_true",
+                        help="ワークブックの生グリッドを内容ハッシュ単位で保存し、次回以降は Excel を解析せずに読む")
+    parser.add_argument("--input-dir", default=INPUT_DIR, help="ワークブックを探すフォルダ")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="マスター・キャッシュ・ストアの出力先")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_csv = os.path.join(args.output_dir, OUTPUT_CSV_NAME)
+    store_path = os.path.join(args.output_dir, STORE_NAME)
+
+    # 並列時も結合順が変わらないよう名前順に固定
+    target_files = sorted(glob.glob(os.path.join(args.input_dir, "sisyou_db_*.xls*")))
+
+    engine = resolve_engine(args.engine)
+    if args.engine == 'calamine' and not calamine_available():
+        print("[警告] python-calamine が無いため、従来のエンジン（openpyxl / xlrd）で読み込みます。")
+
+    print(f"--- 第1工程：労災データベース（詳細分類追加版）の統合を開始 ---")
+    print(f"発見されたパレット（ファイル）数: {len(target_files)}件 (ワーカー数: {args.workers} / エンジン: {engine})\n")
+
+    total_rows = 0
+    mfg_rows = 0
+
+    start_time = time.time()
+
+    # --- 2. 絶対座標抽出コンベア（解析・業種フィルター・列選択はワーカー側で実施） ---
+    cache_dir = shard_cache_dir(args.output_dir, "sisyou")
+    # 解析関数に読み込みエンジンと生グリッドのキャッシュ先を束ねる（ワーカーへもこの形で渡る）
+    extract = functools.partial(extract_injury_workbook, engine=engine,
+                                grid_dir=grid_cache_dir(cache_dir) if args.grid_cache else None)
+
+    writer = MasterWriter(output_csv, INJURY_COLUMNS)
+    # 全文索引の転置リストはワークブックごとに作業フォルダへ書き出し、最後に連結する
+    text_index = new_text_index(spill_dir=text_index_spill_dir(INJURY_TABLE, args.output_dir))
+    with writer:
+        shards = refresh_shards(target_files, extract, cache_dir,
+                                INJURY_SCHEMA_VERSION, workers=args.workers, rebuild=args.rebuild)
+        parsed_files = 0
+        for file, (status, file_rows, result), cached in shards:
+            filename = os.path.basename(file)
+            print(f"[{filename}] を投入中...", end="")
+            total_rows += file_rows
+            if cached:
+                print(" (キャッシュ)", end="")
+            elif status != 'error':
+                parsed_files += 1
+
+            if status == 'ok':
+                # 解析したそばからマスター・ストア・全文索引へ追記し、全ワークブック分の DataFrame は持たない
+                # ストアは作業用テーブルに追記し、マスターの出荷が済んでから差し替える（途中で止まっても旧テーブルが残る）
+                if writer.rows == 0:
+                    create_store_table(staging_table(INJURY_TABLE), INJURY_COLUMNS, store_path)
+                records = writer.append(result)
+                append_store(records, staging_table(INJURY_TABLE), store_path)
+                add_texts(text_index, records['災害状況'])
+                mfg_rows += len(result)
+                print(f" -> 抽出完了（赤のコア: {len(result)}件）")
+            elif status == 'skip':
                 print(" -> [スキップ] 製造業のデータが存在しません。")
+            elif status == 'no_column':
+                print(" -> [警告] 想定される座標（列）が存在しません。")
+            else:
+                print(f" -> [エラー] 読み込み失敗: {result}")
+
+    # --- 3. 圧縮と出力 ---
+    print("\n--- データの結合とマスターCSVの出力 ---")
+    if writer.rows:
+        # 後工程の読み込みを速くするため、型付き（Categorical / 整数）のParquetも併せて出荷する
+        parquet_path = writer.close()
+        # マスターと record_id が揃ったところで作業用テーブルを本番に差し替え、絞り込み用の索引を張る
+        swap_store_table(INJURY_TABLE, store_path)
+        # 災害状況のキーワード検索用に、文字2-gramの全文索引を record_id 単位で作る
+        index_path = save_text_index(finish_text_index(text_index), text_index_path(INJURY_TABLE, args.output_dir))
+
+        end_time = time.time()
+        print(f"[完了] 所要時間: {end_time - start_time:.1f}秒 (再解析: {parsed_files}件 / 全{len(target_files)}件)")
+        print(f"総読み込み行数 (ノイズ・ヘッダー含む) : {total_rows} 行")
+        print(f"製造業のみの純化データ (赤のコア)       : {mfg_rows} 件")
+        print(f"\n[指示] 以下の場所に出荷されました: {os.path.abspath(output_csv)}")
+        if parquet_path:
+            print(f"[指示] Parquet版: {os.path.abspath(parquet_path)}")
         else:
-            print(" -> [警告] 想定される座標（列）が存在しません。")
-
-    except Exception as e:
-        print(f" -> [エラー] 読み込み失敗: {e}")
-
-# --- 3. 圧縮と出力 ---
-print("\n--- データの結合とマスターCSVの出力 ---")
-if all_data:
-    master_df = pd.concat(all_data, ignore_index=True)
-    master_df.to_csv(OUTPUT_CSV, index=False, encoding='utf-8-sig')
-    
-    end_time = time.time()
-    print(f"[完了] 所要時間: {end_time - start_time:.1f}秒")
-    print(f"総読み込み行数 (ノイズ・ヘッダー含む) : {total_rows} 行")
-    print(f"製造業のみの純化データ (赤のコア)       : {mfg_rows} 件")
-    print(f"\n[指示] 以下の場所に出荷されました: {os.path.abspath(OUTPUT_CSV)}")
-else:
-    print("[失敗] 結合できるデータがありませんでした。")
\ No newline at end of file
+            print("[警告] pyarrow が無いため Parquet 版は出力していません（CSVのみ）。")
+        print(f"[指示] 組み込みストア: {os.path.abspath(store_path)} (テーブル: {INJURY_TABLE})")
+        print(f"[指示] 全文索引: {os.path.abspath(index_path)}")
+    else:
+        print("[失敗] 結合できるデータがありませんでした。")
+
+
+# ProcessPoolExecutor はワーカー側でこのファイルを import し直すため、必ずガードする
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,15 @@
-import pandas as pd
-import itertools
-from collections import Counter
 import networkx as nx
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
-from janome.tokenizer import Tokenizer
 import time
 import os
 import warnings
 
+from analyzers import content_words
+from cooccurrence import association_scores, cooccurrence_counts, select_pairs, top_edges, top_edges_per_node
+from master_store import load_master
+from token_cache import TokenCache
+
 # --- 1. 安全装置と空間設計 ---
 warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
 warnings.filterwarnings('ignore', category=UserWarning, module='xlrd')
@@ -19,86 +20,100 @@ plt.rcParams['font.family'] = 'MS Gothic'
 INPUT_CSV = "output/master_sisyou_manufacturing_detailed.csv"
 OUTPUT_DIR = "output"
 
-print("--- 第2工程：共起ネットワーク生成エンジン（完全改修版）起動 ---")
-start_time = time.time()
+# 形態素解析器（analyzers.py の janome / mecab / sudachi。品詞はどれも IPADIC 形式に揃うので絞り込みは共通）
+ANALYZER = "janome"
+# 形態素解析の並列数（災害状況を件単位でプロセスに振り分ける。1 なら並列化しない）
+TOKENIZE_WORKERS = os.cpu_count() or 1
 
-# --- 2. ターゲットの装填（セグメンテーション） ---
-print("[1/4] データの読み込みとターゲットの絞り込み中...")
-df = pd.read_csv(INPUT_CSV, encoding='utf-8-sig', low_memory=False)
+# 辺の選び方: 組を EDGE_MEASURE（count / pmi / npmi / jaccard / dice / llr）で評価し、全体の上位 MAX_EDGES 本を描く
+# （線の太さは共起回数）。既定の count は従来どおり全組から共起回数の上位 MAX_EDGES 本になる。
+# 関連の強さの指標（npmi など）を選んだときだけ、共起 MIN_EDGE_WEIGHT 件未満の組を除き（まれな組の PMI が跳ね上がるのを防ぐ）、
+# 各単語の上位 EDGES_PER_NODE 本に絞る（None なら絞らない）。
+EDGE_MEASURE = "count"
+MIN_EDGE_WEIGHT = 3
+EDGES_PER_NODE = 3
+MAX_EDGES = 60
 
-# 「一般動力機械」による事故のみをスナイプ
-target_df = df[df['起因物_中分類'] == '一般動力機械'].dropna(subset=['災害状況']).copy()
+STOP_WORDS = {'する', 'ある', 'いる', 'なる', '作業', '機械', 'ため', 'ところ', '際', '時', 'こと', 'もの', 'よう', '発生', '被災'}
 
-if len(target_df) > 1000:
-    target_df = target_df.sample(1000, random_state=42)
-print(f" -> 照準セット完了: 一般動力機械の事故 {len(target_df)}件")
 
-# --- 3. 形態素解析（刃によるテキストの解体と濾過） ---
-print("[2/4] 災害状況テキストの解体とストップワードの濾過中...")
-t = Tokenizer()
+def main():
+    print("--- 第2工程：共起ネットワーク生成エンジン（完全改修版）起動 ---")
+    start_time = time.time()
 
-STOP_WORDS = {'する', 'ある', 'いる', 'なる', '作業', '機械', 'ため', 'ところ', '際', '時', 'こと', 'もの', 'よう', '発生', '被災'}
+    # --- 2. ターゲットの装填（セグメンテーション） ---
+    print("[1/4] データの読み込みとターゲットの絞り込み中...")
+    df = load_master(INPUT_CSV, columns=['起因物_中分類', '災害状況'])
+
+    # 「一般動力機械」による事故のみをスナイプ
+    # 共起の集計は疎行列で行うため、件数を間引かず全件を使う
+    target_df = df[df['起因物_中分類'] == '一般動力機械'].dropna(subset=['災害状況']).copy()
+    print(f" -> 照準セット完了: 一般動力機械の事故 {len(target_df)}件")
+
+    # --- 3. 形態素解析（刃によるテキストの解体と濾過） ---
+    print("[2/4] 災害状況テキストの解体とストップワードの濾過中...")
 
-docs_words = []
-for text in target_df['災害状況']:
-    words = []
-    for token in t.tokenize(text):
-        pos = token.part_of_speech.split(',')[0]
-        pos_detail = token.part_of_speech.split(',')[1]
-        base_form = token.base_form
-        
-        if pos in ['名詞', '動詞']:
-            if pos_detail not in ['非自立', '代名詞', '数', '接尾']:
-                if base_form not in STOP_WORDS and len(base_form) > 1:
-                    words.append(base_form)
-    docs_words.append(list(set(words)))
+    # 形態素解析の結果はキャッシュし、未解析の災害状況だけを TOKENIZE_WORKERS 並列で解析する
+    # 名詞・動詞の原形のうち、非自立・代名詞・数・接尾とストップワードを除いたものを数える
+    cache = TokenCache(workers=TOKENIZE_WORKERS, analyzer=ANALYZER)
+    docs_words = [list(set(content_words(tokens, STOP_WORDS)))
+                  for tokens in cache.tokenize_many(target_df['災害状況'].tolist())]
 
-# --- 4. 単語間の結びつき（エッジ）の計測 ---
-print("[3/4] 単語の交差点（共起関係）の頻度計測中...")
-edge_counter = Counter()
+    # --- 4. 単語間の結びつき（エッジ）の計測 ---
+    print("[3/4] 単語の交差点（共起関係）の頻度計測中...")
+    # 事故1件 × 単語の疎行列 X から、共起回数を XᵀX で一括計算する
+    by_association = EDGE_MEASURE != "count"
+    terms, df_counts, pair_matrix = cooccurrence_counts(docs_words, min_count=MIN_EDGE_WEIGHT if by_association else 1)
+    scores = association_scores(pair_matrix, df_counts, len(docs_words), EDGE_MEASURE)
+    if by_association and EDGES_PER_NODE:
+        # どの事故にも出る語が全体を占めないよう、関連の強さで単語ごとに辺を絞る（共起回数も同じ組を取り出す）
+        keep = top_edges_per_node(scores, EDGES_PER_NODE)
+        scores, pair_matrix = select_pairs(scores, keep), select_pairs(pair_matrix, keep)
+    selected_edges = [(pair, count) for pair, _, count in top_edges(terms, scores, pair_matrix, k=MAX_EDGES)]
 
-for words in docs_words:
-    for w1, w2 in itertools.combinations(sorted(words), 2):
-        edge_counter[(w1, w2)] += 1
+    # --- 5. ネットワークグラフの描画 ---
+    print("[4/4] ネットワークグラフ（死のルート）の描画中...")
+    G = nx.Graph()
 
-top_edges = edge_counter.most_common(60)
+    for (w1, w2), weight in selected_edges:
+        G.add_edge(w1, w2, weight=weight)
 
-# --- 5. ネットワークグラフの描画 ---
-print("[4/4] ネットワークグラフ（死のルート）の描画中...")
-G = nx.Graph()
+    plt.figure(figsize=(14, 12)) 
 
-for (w1, w2), weight in top_edges:
-    G.add_edge(w1, w2, weight=weight)
+    # 斥力を高め（k=1.2）、ノード同士を引き離す
+    pos = nx.spring_layout(G, k=1.2, iterations=100, seed=42)
 
-plt.figure(figsize=(14, 12)) 
+    weights = [d['weight'] for (u, v, d) in G.edges(data=True)]
+    max_weight = max(weights)
+    min_weight = min(weights)
 
-# 斥力を高め（k=1.2）、ノード同士を引き離す
-pos = nx.spring_layout(G, k=1.2, iterations=100, seed=42)
+    # 線の太さと色を関係性の密度で変更する
+    # 全辺が同じ共起回数なら差が無いので、ゼロ除算を避けて同じ太さにする
+    weight_range = (max_weight - min_weight) or 1
+    edge_widths = [1 + (d['weight'] - min_weight) / weight_range * 7 for (u, v, d) in G.edges(data=True)]
+    edge_colors = [d['weight'] for (u, v, d) in G.edges(data=True)]
 
-weights = [d['weight'] for (u, v, d) in G.edges(data=True)]
-max_weight = max(weights)
-min_weight = min(weights)
+    # DeprecationWarning回避のため、plt.colormaps を使用
+    edge_cmap = plt.colormaps['Reds']
 
-# 線の太さと色を関係性の密度で変更する
-edge_widths = [1 + (d['weight'] - min_weight) / (max_weight - min_weight) * 7 for (u, v, d) in G.edges(data=True)]
-edge_colors = [d['weight'] for (u, v, d) in G.edges(data=True)]
+    nx.draw_networkx_nodes(G, pos, node_color='lightcoral', node_size=1600, alpha=0.9)
+    nx.draw_networkx_edges(G, pos, width=edge_widths, edge_color=edge_colors, edge_cmap=edge_cmap, edge_vmin=min_weight, edge_vmax=max_weight, alpha=0.6)
 
-# DeprecationWarning回避のため、plt.colormaps を使用
-edge_cmap = plt.colormaps['Reds']
+    # ラベル描画時にも明示的に MS Gothic を指定する
+    nx.draw_networkx_labels(G, pos, font_family='MS Gothic', font_size=13, font_weight='bold')
 
-nx.draw_networkx_nodes(G, pos, node_color='lightcoral', node_size=1600, alpha=0.9)
-nx.draw_networkx_edges(G, pos, width=edge_widths, edge_color=edge_colors, edge_cmap=edge_cmap, edge_vmin=min_weight, edge_vmax=max_weight, alpha=0.6)
+    plt.title("【一般動力機械】労働災害の共起ネットワーク", fontsize=18)
+    plt.axis('off')
 
-# ラベル描画時にも明示的に MS Gothic を指定する
-nx.draw_networkx_labels(G, pos, font_family='MS Gothic', font_size=13, font_weight='bold')
+    output_img = os.path.join(OUTPUT_DIR, "network_machinery_improved.png")
+    plt.savefig(output_img, dpi=300, bbox_inches='tight')
+    plt.close()
 
-plt.title("【一般動力機械】労働災害の共起ネットワーク", fontsize=18)
-plt.axis('off')
+    end_time = time.time()
+    print(f"[完了] 所要時間: {end_time - start_time:.1f}秒")
+    print(f"[指示] グラフを確認せよ: {os.path.abspath(output_img)}")
 
-output_img = os.path.join(OUTPUT_DIR, "network_machinery_improved.png")
-plt.savefig(output_img, dpi=300, bbox_inches='tight')
-plt.close()
 
-end_time = time.time()
-print(f"[完了] 所要時間: {end_time - start_time:.1f}秒")
-print(f"[指示] グラフを確認せよ: {os.path.abspath(output_img)}")
\ No newline at end of file
+# 並列解析のワーカーはこのファイルを import し直すため、必ずガードする
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import numpy as np
+from scipy import sparse
+from scipy.special import xlogy
+
+# --- 共起ネットワーク用の共起行列（疎行列版） ---
+# 単語を整数IDに置き換え、文書（文・災害状況1件）× 単語の 0/1 疎行列 X を作り、
+# 共起回数（2語が同じ文書に現れた文書数）を XᵀX の非対角成分として一度に求める。
+# 文書ごとに itertools.combinations で組を数える方式と同じ結果になるが、Python のループは単語の走査だけになる。
+# ある組の共起回数はどちらの単語の出現文書数も超えないため、min_count 未満の文書にしか出ない単語は積の前に落とす。
+#
+# 辺の重み付けは共起回数のほか、関連の強さの指標（PMI・NPMI・Jaccard・Dice・対数尤度比）も選べる。
+# 共起回数だけで選ぶと「機械」のようにどの文書にも出る語がどのグラフでも中心を占めるため、
+# 出現文書数で割り引いた指標で並べ、さらに単語ごとに上位 k 組の辺だけを残すと、各語の特徴的な結びつきが見える。
+# どの指標も共起のある組（疎行列の非ゼロ）だけで計算するので、語彙が5万語を超えても密な行列は作らない。
+MEASURES = ['count', 'pmi', 'npmi', 'jaccard', 'dice', 'llr']
+
+
+def build_vocabulary(docs, min_count=1):
+    """min_count 件以上の文書に現れる単語を昇順に並べ、(単語のリスト, 出現文書数の配列) を返す。
+
+    単語ID は昇順の位置なので、ID の小さい方を先にした組は sorted() した単語の組と同じ並びになる。
+    """
+    df_counts = {}
+    for words in docs:
+        for word in set(words):
+            df_counts[word] = df_counts.get(word, 0) + 1
+    terms = sorted(w for w, c in df_counts.items() if c >= min_count)
+    return terms, np.array([df_counts[w] for w in terms], dtype=np.int64)
+
+
+def document_term_matrix(docs, terms):
+    """文書 × 単語の 0/1 疎行列（CSR）を作る。terms に無い単語は無視する。"""
+    term_ids = {w: i for i, w in enumerate(terms)}
+    rows, cols = [], []
+    for doc_id, words in enumerate(docs):
+        ids = {term_ids[w] for w in words if w in term_ids}
+        rows.extend([doc_id] * len(ids))
+        cols.extend(ids)
+    data = np.ones(len(cols), dtype=np.int32)
+    return sparse.csr_matrix((data, (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+                             shape=(len(docs), len(terms)))
+
+
+def cooccurrence_counts(docs, min_count=1):
+    """共起回数を数える。戻り値は (単語のリスト, 出現文書数, 共起回数の疎行列)。
+
+    共起回数の行列は上三角（行 < 列）だけを持つ COO 形式で、min_count 未満の組は含まない。
+    """
+    terms, df_counts = build_vocabulary(docs, min_count)
+    x = document_term_matrix(docs, terms)
+    counts = (x.T @ x).tocoo()
+    keep = (counts.row < counts.col) & (counts.data >= min_count)
+    upper = sparse.coo_matrix((counts.data[keep], (counts.row[keep], counts.col[keep])), shape=counts.shape)
+    return terms, df_counts, upper
+
+
+def association_scores(counts, df_counts, n_docs, measure='count'):
+    """共起回数の疎行列（cooccurrence_counts の戻り値）と同じ組について、measure の値を持つ COO を返す。
+
+    n_ij = 組の共起文書数, n_i・n_j = 各単語の出現文書数, N = 文書数 として
+      count   : n_ij
+      pmi     : log(N・n_ij / (n_i・n_j))
+      npmi    : pmi / -log(n_ij / N)（-1〜1。常に一緒に出る組は 1）
+      jaccard : n_ij / (n_i + n_j - n_ij)
+      dice    : 2・n_ij / (n_i + n_j)
+      llr     : 2×2 分割表の対数尤度比 G²（期待より共起が少ない組は負にする）
+    """
+    if measure not in MEASURES:
+        raise ValueError(f"未対応の指標です: {measure}（{', '.join(MEASURES)} から選ぶ）")
+    n_ij = counts.data.astype(np.float64)
+    n_i = df_counts[counts.row].astype(np.float64)
+    n_j = df_counts[counts.col].astype(np.float64)
+    n = float(n_docs)
+
+    if measure == 'count':
+        data = counts.data
+    elif measure == 'pmi':
+        data = np.log(n * n_ij / (n_i * n_j))
+    elif measure == 'npmi':
+        pmi = np.log(n * n_ij / (n_i * n_j))
+        denominator = -np.log(n_ij / n)
+        data = np.divide(pmi, denominator, out=np.ones_like(pmi), where=denominator > 0)
+    elif measure == 'jaccard':
+        data = n_ij / (n_i + n_j - n_ij)
+    elif measure == 'dice':
+        data = 2 * n_ij / (n_i + n_j)
+    else:
+        # G² = 2(Σ k log k - Σ 行和 log 行和 - Σ 列和 log 列和 + N log N)。0 log 0 = 0 は xlogy が扱う
+        cells = (xlogy(n_ij, n_ij) + xlogy(n_i - n_ij, n_i - n_ij) + xlogy(n_j - n_ij, n_j - n_ij)
+                 + xlogy(n - n_i - n_j + n_ij, n - n_i - n_j + n_ij))
+        margins = xlogy(n_i, n_i) + xlogy(n - n_i, n - n_i) + xlogy(n_j, n_j) + xlogy(n - n_j, n - n_j)
+        g2 = np.maximum(2 * (cells - margins + xlogy(n, n)), 0.0)
+        data = np.where(n_ij * n < n_i * n_j, -g2, g2)
+    return sparse.coo_matrix((data, (counts.row, counts.col)), shape=counts.shape)
+
+
+def top_edges_per_node(scores, k):
+    """各単語について、その単語を含む組のうち値の大きい k 組を選ぶ。どちらかの単語で選ばれた組を True にした真偽値の配列を返す。
+
+    配列は scores の組の並びなので、select_pairs で scores と共起回数の行列の両方から同じ組を取り出せる。
+
+    単語ごとに組を並べた CSR の1行から、np.partition で k 番目の値を求めて上位 k 組を取る（全体の並べ替えはしない）。
+    k 番目と同じ値の組が複数あれば、相手の単語ID の小さい方から取る。組が k 以下の単語はその組をすべて残す。
+    """
+    n_edges = len(scores.data)
+    n_terms = scores.shape[0]
+    # 上三角の組を両方向に並べる（行 = 単語, 列 = 相手の単語, 値 = 組の番号 + 1。0 は疎行列で消えるため）
+    edge_ids = np.arange(1, n_edges + 1)
+    by_node = sparse.csr_matrix((np.concatenate([edge_ids, edge_ids]),
+                                 (np.concatenate([scores.row, scores.col]), np.concatenate([scores.col, scores.row]))),
+                                shape=(n_terms, n_terms))
+    ids = by_node.data - 1
+    values = scores.data[ids]
+    keep = np.zeros(n_edges, dtype=bool)
+
+    degrees = np.diff(by_node.indptr)
+    keep[ids[np.repeat(degrees <= k, degrees)]] = True
+    for node in np.flatnonzero(degrees > k):
+        start, end = by_node.indptr[node], by_node.indptr[node + 1]
+        row_values = values[start:end]
+        kth = np.partition(row_values, len(row_values) - k)[len(row_values) - k]
+        above = np.flatnonzero(row_values > kth)
+        ties = np.flatnonzero(row_values == kth)
+        ties = ties[np.argsort(by_node.indices[start:end][ties], kind='stable')[:k - len(above)]]
+        keep[ids[start:end][above]] = True
+        keep[ids[start:end][ties]] = True
+    return keep
+
+
+def select_pairs(matrix, keep):
+    """組の真偽値の配列 keep で、共起回数や指標の COO から組を取り出す（並びは保つ）。"""
+    return sparse.coo_matrix((matrix.data[keep], (matrix.row[keep], matrix.col[keep])), shape=matrix.shape)
+
+
+def top_pairs(terms, counts, k=None):
+    """値（共起回数や association_scores の指標）の大きい順に ((単語1, 単語2), 値) を返す（同じ値なら単語の昇順）。
+
+    k を指定すれば上位 k 組だけ。
+    """
+    order = np.lexsort((counts.col, counts.row, -counts.data))
+    if k is not None:
+        order = order[:k]
+    return [((terms[counts.row[i]], terms[counts.col[i]]), counts.data[i].item()) for i in order]
+
+
+def top_edges(terms, scores, counts, k=None):
+    """scores の大きい順に ((単語1, 単語2), 値, 共起回数) を返す（同じ値なら単語の昇順）。k を指定すれば上位 k 組だけ。
+
+    scores と counts は同じ組を同じ並びで持つこと（association_scores の戻り値と元の共起回数、
+    またはそれぞれを同じ keep で select_pairs したもの）。共起回数は選んだ組の分だけ読む。
+    """
+    order = np.lexsort((scores.col, scores.row, -scores.data))[:k]
+    return [((terms[scores.row[i]], terms[scores.col[i]]), scores.data[i].item(), int(counts.data[i])) for i in order]
@@ -0,0 +1,203 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from accident_store import STORE_PATH, fetch_records, store_exists
+from dashboard_data import (COUNT_COLUMN, ViewCache, condition_values, hierarchy_children, master_version,
+                            prepare_dashboard_frame, selects_all, sort_rows)
+from master_store import master_parquet_path
+
+# --- 大きなマスター（死傷DB）向けのダッシュボード用バックエンド ---
+# 死傷DBのマスターは死亡DBより1桁大きく、セッションのメモリに全件を載せられない。
+# そこで型付きParquet（MasterWriter がワークブックごとの行グループで書いたもの）をディスク上に置いたまま、
+# 必要な列だけを行グループ単位で読み、絞り込み・集計・並べ替えをその場で行う。
+# 行グループの統計（年の最小・最大）で対象外の行グループは読み飛ばす。
+# 行の位置（= record_id）は行グループの開始位置から求めるので、全文索引や組み込みストアとそのまま対応する。
+# 表示中のページの長文（災害状況）は組み込みストアがあれば record_id で取り寄せる。
+
+
+class ColumnarMaster:
+    """Parquet のマスターを読み込まずに、ダッシュボードの絞り込み・集計に答える。
+
+    列名はダッシュボードの表記（事業場規模 = 規模区分）で受け取り、読み込み後は
+    prepare_dashboard_frame で in-memory 版と同じ型付け・穴埋めを行うので、結果は dashboard_data と一致する。
+    """
+
+    def __init__(self, parquet_path, indexed_columns, hierarchy=(), table=None, db_path=STORE_PATH):
+        import pyarrow.parquet as pq
+
+        self.parquet_path = parquet_path
+        self.table = table
+        self.db_path = db_path
+        # メタデータは一度だけ読み、以後の読み込みで使い回す（ParquetFile は走査ごとに開き直す）
+        self._metadata = pq.ParquetFile(parquet_path).metadata
+        self.column_names = self._metadata.schema.to_arrow_schema().names
+        self._names = set(self.column_names)
+        sizes = [self._metadata.row_group(i).num_rows for i in range(self._metadata.num_row_groups)]
+        self._offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        self.n = int(self._offsets[-1])
+        self._stats = self._int_statistics(indexed_columns)
+        self.options = self._build_options(indexed_columns, hierarchy)
+
+    def _physical(self, columns):
+        # ダッシュボードの「事業場規模」は取り込み時に計算済みの規模区分を読む（prepare_dashboard_frame が差し替える）
+        wanted = set(columns) | {'年', '月'}
+        if '事業場規模' in wanted and '事業場規模_区分' in self._names:
+            wanted = (wanted - {'事業場規模'}) | {'事業場規模_区分'}
+        return [c for c in self._names if c in wanted]
+
+    def _int_statistics(self, columns):
+        """整数列の行グループごとの (最小, 最大)。統計が無い行グループは None。"""
+        schema = self._metadata.schema
+        positions = {schema.column(j).name: j for j in range(len(schema))}
+        stats = {}
+        for col in columns:
+            if col not in positions:
+                continue
+            per_group = []
+            for i in range(self._metadata.num_row_groups):
+                st = self._metadata.row_group(i).column(positions[col]).statistics
+                per_group.append((st.min, st.max) if st is not None and st.has_min_max
+                                 and isinstance(st.min, int) else None)
+            stats[col] = per_group
+        return stats
+
+    def _row_groups(self, filters):
+        """条件に合う行が入っている可能性のある行グループの番号。"""
+        groups = range(self._metadata.num_row_groups)
+        for col, value in (filters or {}).items():
+            if value is None or col not in self._stats:
+                continue
+            values = [v for v in condition_values(value) if isinstance(v, (int, np.integer))]
+            if not values:
+                continue
+            groups = [i for i in groups if self._stats[col][i] is None
+                      or any(self._stats[col][i][0] <= v <= self._stats[col][i][1] for v in values)]
+        return list(groups)
+
+    def _read(self, columns, filters=None):
+        """条件に関係する行グループを1つずつ読み、ダッシュボード用に整えた DataFrame を返す。
+
+        index は record_id（マスターでの行番号）。
+        """
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(self.parquet_path, metadata=self._metadata)
+        physical = self._physical(columns)
+        for i in self._row_groups(filters):
+            df = parquet.read_row_group(i, columns=physical).to_pandas()
+            df.index = pd.RangeIndex(self._offsets[i], self._offsets[i + 1], name='record_id')
+            yield prepare_dashboard_frame(df)
+
+    def _mask(self, df, filters):
+        """dashboard_data.filter_bitmap と同じ約束で、条件に合う行の真偽値を返す。"""
+        mask = np.ones(len(df), dtype=bool)
+        for col, value in (filters or {}).items():
+            if value is None:
+                continue
+            values = condition_values(value)
+            if selects_all(self.options[col], values):
+                continue
+            mask &= df[col].isin(values).to_numpy()
+        return mask
+
+    def _build_options(self, columns, hierarchy):
+        values = {col: set() for col in columns}
+        pairs = []
+        for df in self._read(list(columns) + list(hierarchy)):
+            for col in columns:
+                values[col].update(df[col].dropna().unique().tolist())
+            if hierarchy:
+                pairs.append(df[list(hierarchy)].drop_duplicates())
+        options = {col: sorted(vals) for col, vals in values.items()}
+        # 階層の組み合わせは行グループごとに重複を落としてから、まとめて子の一覧にする
+        combos = pd.concat(pairs, ignore_index=True).astype(object) if pairs else pd.DataFrame(columns=list(hierarchy))
+        options['children'] = hierarchy_children(combos, hierarchy)
+        return options
+
+    def summarize(self, filters, groupings):
+        """条件に合う件数と、groupings（列名 または 列名のリスト）ごとの件数を1回の走査で求める。
+
+        集計は cube_totals と同じ形（by を index にした件数の Series。欠損の値は数えない）で返す。
+        """
+        by_lists = [[by] if isinstance(by, str) else list(by) for by in groupings]
+        columns = set(filters or {}) | {c for by in by_lists for c in by}
+        count = 0
+        parts = [[] for _ in by_lists]
+        for df in self._read(columns, filters):
+            df = df[self._mask(df, filters)]
+            count += len(df)
+            for part, by in zip(parts, by_lists):
+                part.append(df.groupby(by, observed=True).size())
+        totals = []
+        for part, by, grouping in zip(parts, by_lists, groupings):
+            key = by[0] if isinstance(grouping, str) else by
+            merged = pd.concat(part) if part else pd.Series(dtype='int64')
+            # 行グループごとのカテゴリが違うので、値で揃えてから合計し直す
+            merged = merged.groupby(level=list(range(len(by)))).sum() if len(merged) else merged
+            merged.index.names = by if len(by) > 1 else [key]
+            totals.append(merged.rename(COUNT_COLUMN))
+        return count, totals
+
+    def select_rows(self, filters, by=(), descending=False):
+        """条件に合う行の record_id を、by の列の順（同じ値どうしは record_id 順）に並べて返す。"""
+        ids, keys = [], []
+        for df in self._read(set(filters or {}) | set(by), filters):
+            mask = self._mask(df, filters)
+            ids.append(df.index.to_numpy()[mask])
+            if by:
+                keys.append(df.loc[mask, list(by)])
+        if not ids:
+            return np.array([], dtype=np.int64)
+        rows = np.concatenate(ids)
+        if not by:
+            return rows
+        # 行グループごとにカテゴリが違う列は object になるので、数値にできなければ値の順で並べる
+        key_df = pd.concat(keys, ignore_index=True)
+        for col in by:
+            numeric = pd.to_numeric(key_df[col], errors='coerce')
+            key_df[col] = numeric if numeric.notna().sum() == key_df[col].notna().sum() else key_df[col].astype('category')
+        return rows[sort_rows(key_df, np.arange(len(key_df)), list(by), descending)]
+
+    def fetch_page(self, record_ids, columns):
+        """record_ids の行の columns を、record_ids の順で返す（ページ表示用）。
+
+        災害状況などの長文は組み込みストアがあればそちらから取り寄せ、行グループからは読まない。
+        """
+        import pyarrow.parquet as pq
+
+        record_ids = np.asarray(record_ids, dtype=np.int64)
+        text_columns = [c for c in columns if c == '災害状況']
+        if text_columns and self.table and store_exists(self.table, self.db_path):
+            frame_columns = [c for c in columns if c not in text_columns]
+        else:
+            frame_columns, text_columns = list(columns), []
+
+        groups = np.unique(np.searchsorted(self._offsets, record_ids, side='right') - 1)
+        parquet = pq.ParquetFile(self.parquet_path, metadata=self._metadata)
+        frames = []
+        for i in groups:
+            df = parquet.read_row_group(int(i), columns=self._physical(frame_columns)).to_pandas()
+            df.index = pd.RangeIndex(self._offsets[i], self._offsets[i + 1], name='record_id')
+            df = prepare_dashboard_frame(df)
+            frames.append(df.loc[df.index.intersection(record_ids), frame_columns].astype(object))
+        page = pd.concat(frames) if frames else pd.DataFrame(columns=frame_columns)
+        page = page.reindex(record_ids)
+        page.index.name = 'record_id'
+        if text_columns:
+            page = page.join(fetch_records(record_ids, columns=text_columns, table=self.table, db_path=self.db_path))
+        return page
+
+
+def load_columnar_dataset(csv_path, indexed_columns, hierarchy=(), table=None, db_path=STORE_PATH):
+    """load_dataset と同じ形の一式を、データを読み込まずに作る（df は None、columnar に問い合わせ先を入れる）。"""
+    columnar = ColumnarMaster(master_parquet_path(csv_path), indexed_columns, hierarchy, table, db_path)
+    return {
+        'version': master_version(csv_path),
+        'loaded_at': time.time(),
+        'df': None,
+        'columnar': columnar,
+        'options': columnar.options,
+        'views': ViewCache(),
+    }
@@ -0,0 +1,327 @@
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from master_store import fill_unknown, load_master, master_parquet_path, size_bucket, to_typed_columns
+
+# --- ダッシュボード（app.py）のデータ読み込み ---
+# 欠損を「不明」で埋める列
+FILL_COLUMNS = ['起因物_大分類', '起因物_中分類', '起因物_小分類', '事業場規模', '発生時間']
+
+
+def load_dashboard_frame(csv_path, columns=None):
+    """ダッシュボード用にマスターを読み込み、型付け・欠損の穴埋め・規模区分の付与まで済ませる。
+
+    CSV しか無い場合も、低カーディナリティの列は Parquet 版と同じく Categorical に揃える。
+    index はマスターの行番号（= 組み込みストアの record_id）のまま保持する。
+    """
+    return prepare_dashboard_frame(load_master(csv_path, columns=columns))
+
+
+def prepare_dashboard_frame(df):
+    """読み込んだマスター（またはその一部）に、型付け・欠損の穴埋め・規模区分の付与を行う。"""
+    df = to_typed_columns(df)
+    df = fill_unknown(df, FILL_COLUMNS)
+    df = df.dropna(subset=['年', '月'])
+
+    # --- 【ハイブリッド改修】事業場規模の意味的クレンジング（DBの限界 × 安衛法基準） ---
+    # 区分は取り込み時に「事業場規模_区分」として計算済み。古いマスターなら早見表で一括変換する
+    if '事業場規模_区分' in df.columns:
+        df['事業場規模'] = df.pop('事業場規模_区分')
+    elif '事業場規模' in df.columns:
+        df['事業場規模'] = size_bucket(df['事業場規模']).astype('category')
+    return df
+
+
+def master_version(csv_path):
+    """マスター（CSV と Parquet）の (サイズ, 更新時刻) の組。ビルダーが書き直すと値が変わる。
+
+    中身のハッシュは再実行のたびに計算するには重いため、os.stat だけで判定する。
+    """
+    version = []
+    for path in (csv_path, master_parquet_path(csv_path)):
+        try:
+            st = os.stat(path)
+            version.append((st.st_size, st.st_mtime_ns))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+
+def _freeze(index):
+    # 全セッションで共有するため、ビットマップは読み取り専用にしておく
+    for col_bitmaps in index['bitmaps'].values():
+        for bitmap in col_bitmaps.values():
+            bitmap.flags.writeable = False
+    return index
+
+
+def load_dataset(csv_path, columns, indexed_columns, hierarchy=()):
+    """ダッシュボードが使う一式（データ・ビットマップ索引・集計キューブ・選択肢）をまとめて作る。
+
+    app.py ではプロセス全体で1つだけ保持し（st.cache_resource）、全セッションが同じものを読み取り専用で使う。
+    """
+    df = load_dashboard_frame(csv_path, columns=columns)
+    cube = build_count_cube(df)
+    filter_index = _freeze(build_bitmap_index(df, indexed_columns))
+    return {
+        'version': master_version(csv_path),
+        # 作成時刻（app.py の計測で、読み込みがキャッシュ命中だったかの判定に使う）
+        'loaded_at': time.time(),
+        'df': df,
+        'filter_index': filter_index,
+        # サイドバーの選択肢は再実行のたびに並べ替えず、データの版ごとに一度だけ作る
+        'options': build_options(df, filter_index, indexed_columns, hierarchy),
+        'cube': cube,
+        # キューブのセルにも同じビットマップ索引を張り、同じ条件で絞り込めるようにする
+        'cube_index': _freeze(build_bitmap_index(cube, indexed_columns)),
+        # 絞り込み結果のキャッシュもデータと同じ寿命にする（マスターが変われば捨てられる）
+        'views': ViewCache(),
+    }
+
+
+# --- ダッシュボード（app.py）の絞り込みエンジン ---
+# 絞り込みに使う列の値ごとに「その値を持つ行」のビットマップ（1行 = 1ビット）を事前に作っておき、
+# フィルターの組み合わせはビットマップの OR（同じ列の複数選択）と AND（列どうし）だけで解決する。
+# DataFrame のコピーや列ごとの比較は行わず、最後に残った行だけを取り出す。
+
+
+def build_bitmap_index(df, columns):
+    """columns の各列について {値: packbits したビットマップ} を作る。
+
+    ビット位置は df の行の位置（0始まり）で、index（record_id）ではない。欠損値はどの値にも属さない。
+    """
+    n = len(df)
+    bitmaps = {}
+    for col in columns:
+        if col not in df.columns:
+            continue
+        codes, uniques = pd.factorize(df[col], sort=True)
+        # 値ごとの行位置を1回の並べ替えでまとめて求める（値の数 × 行数の比較をしない）
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        col_bitmaps = {}
+        for k, value in enumerate(uniques.tolist()):
+            bits = np.zeros(n, dtype=bool)
+            bits[order[bounds[k]:bounds[k + 1]]] = True
+            col_bitmaps[value] = np.packbits(bits)
+        bitmaps[col] = col_bitmaps
+    return {'n': n, 'bitmaps': bitmaps}
+
+
+def index_values(index, column):
+    """索引に載っている column の値を昇順で返す（サイドバーの選択肢用）。"""
+    return sorted(index['bitmaps'].get(column, {}))
+
+
+def build_options(df, index, columns, hierarchy):
+    """サイドバーの選択肢を一度だけ作る。
+
+    columns は各列の値の一覧、hierarchy（例: 業種の大→中→小）は
+    {(親の値, ...): [子の値, ...]} の形で、親の選択に応じた子の一覧を引けるようにする。
+    """
+    options = {col: index_values(index, col) for col in columns}
+    options['children'] = hierarchy_children(df, hierarchy)
+    return options
+
+
+def hierarchy_children(df, hierarchy):
+    """{(親の値, ...): [子の値, ...]}（昇順）を作る。df は階層の列を持っていればよい。"""
+    children = {}
+    for depth in range(1, len(hierarchy)):
+        parents, child = list(hierarchy[:depth]), hierarchy[depth]
+        pairs = df[parents + [child]].dropna().drop_duplicates()
+        for key, group in pairs.groupby(parents, observed=True):
+            children[key if isinstance(key, tuple) else (key,)] = sorted(group[child].unique().tolist())
+    return children
+
+
+def _column_bitmap(col_bitmaps, values, n_bytes):
+    hits = [col_bitmaps[v] for v in values if v in col_bitmaps]
+    if not hits:
+        return np.zeros(n_bytes, dtype=np.uint8)
+    return np.bitwise_or.reduce(hits) if len(hits) > 1 else hits[0]
+
+
+def selects_all(known_values, values):
+    """values が列の既知の値をすべて含むか（含むなら、その条件は絞り込みにならない）。"""
+    return len(values) >= len(known_values) and set(known_values) <= set(values)
+
+
+def condition_values(value):
+    """フィルター条件の値（単独の値 または リスト・タプル・集合）をリストにそろえる。"""
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def filter_bitmap(index, filters):
+    """{列名: 値 または 値のリスト} を満たす行のビットマップを返す。条件が無ければ None（全行）。
+
+    値が None の条件は無視し、列の全ての値を選んでいる条件も絞り込みにならないので飛ばす。
+    空のリストは「該当なし」として扱う（accident_store の filters と同じ約束）。
+    """
+    n_bytes = (index['n'] + 7) // 8
+    result = None
+    for col, value in (filters or {}).items():
+        if value is None:
+            continue
+        values = condition_values(value)
+        col_bitmaps = index['bitmaps'][col]
+        if selects_all(col_bitmaps, values):
+            continue
+        bitmap = _column_bitmap(col_bitmaps, values, n_bytes)
+        result = bitmap if result is None else np.bitwise_and(result, bitmap)
+    return result
+
+
+def select_rows(index, filters):
+    """条件を満たす行の位置（昇順の配列）を返す。"""
+    bitmap = filter_bitmap(index, filters)
+    if bitmap is None:
+        return np.arange(index['n'])
+    return np.flatnonzero(np.unpackbits(bitmap, count=index['n']))
+
+
+def normalize_filters(options, filters):
+    """条件を選択順によらない tuple にする（キャッシュのキー用）。options は列ごとの値の一覧（build_options）。
+
+    絞り込みにならない条件（None・列の全値の選択）は落とし、単一値と1要素のリストは同じキーにする。
+    """
+    key = []
+    for col in sorted(filters or {}):
+        value = filters[col]
+        if value is None:
+            continue
+        values = condition_values(value)
+        if selects_all(options[col], values):
+            continue
+        key.append((col, tuple(sorted(set(values), key=repr))))
+    return tuple(key)
+
+
+# --- 集計キューブ（グラフ用の事前集計） ---
+# (年, 月, 発生時間, 事業場規模, 業種_小分類, 起因物_小分類, 事故の型) ごとの件数を一度だけ数えておき、
+# グラフは絞り込み条件に合うセルの件数を足し合わせて描く。業種・起因物の大分類/中分類は小分類から決まるため、
+# キューブの粒度を変えずに軸として持たせ、階層の絞り込みやサンバーストにそのまま使う。
+COUNT_COLUMN = '件数'
+CUBE_DIMENSIONS = [
+    '年', '月', '発生時間', '事業場規模',
+    '業種_大分類', '業種_中分類', '業種_小分類',
+    '起因物_大分類', '起因物_中分類', '起因物_小分類',
+    '事故の型'
+]
+
+
+def build_count_cube(df, dimensions=CUBE_DIMENSIONS):
+    """dimensions の組み合わせごとの件数表（1行 = 1セル）を作る。欠損もひとつの値としてセルに残す。"""
+    dims = [c for c in dimensions if c in df.columns]
+    cube = df.groupby(dims, observed=True, dropna=False, sort=False).size()
+    return cube.rename(COUNT_COLUMN).reset_index()
+
+
+def cube_totals(cube, rows, by):
+    """キューブの rows 番目のセルを by ごとに合計した件数（Series）を返す。欠損の値は数えない。"""
+    return cube.take(rows).groupby(by, observed=True)[COUNT_COLUMN].sum()
+
+
+# --- 絞り込み結果のキャッシュ ---
+# よく使う条件の組み合わせを行き来したときに、行の特定・集計・図の生成をやり直さないためのもの
+VIEW_CACHE_BYTES = 64 * 1024 ** 2
+
+
+def estimate_nbytes(value):
+    """キャッシュに載せる値のおおよそのメモリ量（バイト）。"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v) for v in value)
+    if hasattr(value, 'to_json'):
+        # Plotly の図は JSON にしたときの大きさで見積もる
+        return len(value.to_json())
+    return sys.getsizeof(value)
+
+
+class ViewCache:
+    """絞り込み結果の LRU キャッシュ。合計が max_bytes を超えたら古いものから捨てる。
+
+    データと一緒にプロセス全体で共有するため、出し入れはロックで守る。
+    """
+
+    def __init__(self, max_bytes=VIEW_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """key の値を返す。無ければ compute() で作って載せる。戻り値は (値, キャッシュに有ったか)。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], True
+            self.misses += 1
+
+        # 重い計算はロックの外で行う（同じ key が同時に来たら両方計算し、先に終わった方を残す）
+        value = compute()
+        size = estimate_nbytes(value)
+        with self._lock:
+            if size <= self.max_bytes and key not in self._entries:
+                self._entries[key] = (value, size)
+                self.nbytes += size
+                while self.nbytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.nbytes -= evicted
+        return value, False
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries),
+                    'nbytes': self.nbytes, 'max_bytes': self.max_bytes}
+
+
+# --- 抽出データ一覧（ページ送り・並べ替え・キーワード検索） ---
+
+def _sort_key(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # カテゴリの並びは値の昇順とは限らない（Parquet の辞書は出現順）ため、値の順位に置き換える
+        categories = series.cat.categories
+        rank = np.empty(len(categories), dtype=np.int64)
+        rank[np.argsort(categories.to_numpy())] = np.arange(len(categories))
+        codes = series.cat.codes.to_numpy()
+        return np.where(codes >= 0, rank[codes], -1)
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+
+def sort_rows(df, rows, by, descending=False):
+    """rows（行の位置）を by の列の順に並べ替える。同じ値どうしは元の順（record_id 順）のまま。"""
+    if not by or len(rows) == 0:
+        return rows
+    keys = [_sort_key(df[col].take(rows)) for col in reversed(by)]
+    if descending:
+        keys = [-k for k in keys]
+    return rows[np.lexsort(keys)]
+
+
+def keep_record_ids(df, rows, record_ids):
+    """rows のうち、record_id（df の index）が record_ids に含まれる行だけを残す。"""
+    return rows[np.isin(df.index.to_numpy()[rows], record_ids)]
+
+
+def page_slice(rows, page, page_size):
+    """1始まりの page 番目のページに当たる行の位置を返す。"""
+    start = (page - 1) * page_size
+    return rows[start:start + page_size]
@@ -0,0 +1,89 @@
+import os
+import json
+import time
+import logging
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+# --- ダッシュボード（app.py）の処理時間の計測 ---
+# 再実行1回ごとに「読み込み / 絞り込み / 集計 / 図の作成 / 一覧表」の工程別の時間・件数・キャッシュ命中を記録し、
+# 1行1レコードの JSON として metrics ファイルへ追記する（一定サイズで世代交代するので肥大化しない）。
+METRICS_PATH = os.path.join("output", "dashboard_metrics.jsonl")
+METRICS_MAX_BYTES = 5 * 1024 ** 2
+METRICS_BACKUPS = 3
+
+
+class RerunMetrics:
+    """1回の再実行（または一覧表だけの部分再実行）の工程別計測。"""
+
+    def __init__(self, kind='rerun'):
+        self.kind = kind
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.stages = []
+        self.finished = False
+
+    def record(self, name, seconds, rows=None, cache_hit=None):
+        self.stages.append({'stage': name, 'ms': round(seconds * 1000, 2), 'rows': rows, 'cache_hit': cache_hit})
+
+    @contextmanager
+    def stage(self, name, rows=None, cache_hit=None):
+        """with 文の中の処理時間を name の工程として記録する。件数・命中は yield した dict に後から書ける。"""
+        info = {'rows': rows, 'cache_hit': cache_hit}
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self.record(name, time.perf_counter() - start, info['rows'], info['cache_hit'])
+
+    def extend(self, other):
+        self.stages.extend(other.stages)
+
+    def total_ms(self):
+        return (time.perf_counter() - self._start) * 1000
+
+    def finish(self, **extra):
+        """計測を締め、metrics ファイルに書く1レコードを返す。"""
+        self.finished = True
+        return {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            'kind': self.kind,
+            'total_ms': round(self.total_ms(), 2),
+            **extra,
+            'stages': self.stages,
+        }
+
+
+def _metrics_logger(path):
+    logger = logging.getLogger(f"dashboard.metrics.{os.path.abspath(path)}")
+    if not logger.handlers:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=METRICS_MAX_BYTES, backupCount=METRICS_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False  # コンソールのログには流さない
+    return logger
+
+
+def write_metrics(record, path=METRICS_PATH):
+    """計測レコードを metrics ファイルへ1行追記する（書けなくてもダッシュボードは止めない）。"""
+    try:
+        _metrics_logger(path).info(json.dumps(record, ensure_ascii=False))
+    except OSError as e:
+        logging.getLogger("dashboard").warning("[警告] 計測結果を書き込めませんでした: %s", e)
+
+
+def read_metrics(path=METRICS_PATH, limit=50):
+    """metrics ファイルの直近 limit 件を古い順に返す（管理者パネル用）。"""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        lines = f.readlines()[-limit:]
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue  # 書き込み途中の行は読み飛ばす
+    return records
@@ -2,9 +2,11 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
-import re
 from datetime import datetime
 
+from accident_store import query_records, store_columns, store_exists
+from master_store import compact_categories, fill_unknown, hour_label, load_master
+
 # --- 1. 空間設定とデータの精製 ---
 plt.rcParams['font.family'] = 'MS Gothic'
 OUTPUT_DIR = "output_assets"
@@ -14,26 +16,24 @@ current_time = datetime.now().strftime("%Y%m%d_%H%M")
 
 print(f"--- 記事用アセット（画像）生成エンジン起動 [{current_time}] ---")
 
-df = pd.read_csv("output/master_sibou_all_industries.csv", encoding='utf-8-sig', low_memory=False)
-mfg_df = df[df['業種_大分類'] == '製造業'].copy()
+ASSET_COLUMNS = ['年', '発生時間', '発生時間_時', '起因物_中分類']
+if store_exists():
+    # 組み込みストアがあれば製造業の絞り込みをDB側（索引）で行い、使う列だけを受け取る
+    mfg_df = query_records({'業種_大分類': '製造業'}, columns=store_columns(ASSET_COLUMNS))
+else:
+    # 型付きParquetがあればそちらを優先して読む
+    df = load_master("output/master_sibou_all_industries.csv", columns=ASSET_COLUMNS + ['業種_大分類'])
+    mfg_df = df[df['業種_大分類'] == '製造業'].copy()
 
 mfg_df = mfg_df.dropna(subset=['年', '発生時間'])
-mfg_df['起因物_中分類'] = mfg_df['起因物_中分類'].fillna('不明')
+mfg_df = fill_unknown(mfg_df, ['起因物_中分類'])
 
 # --- 発生時間の表記揺れ粉砕とゼロ埋め（00時台〜23時台） ---
-def format_time(t_str):
-    if pd.isna(t_str) or '不明' in str(t_str):
-        return '不明'
-    if '8～7' in str(t_str):
-        return '不明'
-    match = re.search(r'(\d+)', str(t_str))
-    if match:
-        hour = int(match.group(1))
-        return f"{hour:02d}時台"
-    return '不明'
-
-mfg_df['発生時間_整形'] = mfg_df['発生時間'].apply(format_time)
+# 取り込み時に正規化済みの「発生時間_時」からラベルを引く（古いマスターでは一括で計算し直す）
+mfg_df['発生時間_整形'] = hour_label(mfg_df)
 mfg_df = mfg_df[mfg_df['発生時間_整形'] != '不明']
+# 製造業に絞った後の未使用カテゴリを落とし、クロス集計に空の行列が出ないようにする
+mfg_df = compact_categories(mfg_df)
 
 print(f"対象データ: 製造業の死亡事故 {len(mfg_df)} 件")
 
@@ -78,7 +78,7 @@ print("2/2: 時間帯×起因物のヒートマップ生成中...")
 time_order = [f"{i:02d}時台" for i in range(24)]
 
 top_10_causes = mfg_df['起因物_中分類'].value_counts().nlargest(10).index.tolist()
-heatmap_df = mfg_df[mfg_df['起因物_中分類'].isin(top_10_causes)]
+heatmap_df = compact_categories(mfg_df[mfg_df['起因物_中分類'].isin(top_10_causes)].copy())
 
 matrix_data = pd.crosstab(heatmap_df['起因物_中分類'], heatmap_df['発生時間_整形'])
 matrix_data = matrix_data.reindex(columns=time_order, fill_value=0)
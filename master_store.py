@@ -0,0 +1,312 @@
+import os
+import re
+import shutil
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+# --- マスターデータの保存形式（CSV + 型付きParquet）と読み込みの共通窓口 ---
+# CSVは従来通り出力し続け、Parquetがあれば各ツールはそちらを優先して読む
+
+# 辞書エンコード（Categorical）で保持する低カーディナリティ列
+CATEGORY_COLUMNS = [
+    '業種_大分類', '業種_中分類', '業種_小分類',
+    '起因物_大分類', '起因物_中分類', '起因物_小分類',
+    '事故の型', '事業場規模', '発生時間', '事業場規模_区分'
+]
+
+# 整数として保持したい列（死亡DBの「年」は 'H25' 等の元号文字列なので Categorical に回る）
+INT_COLUMNS = ['年', '月', '年齢', '西暦年', '発生時間_時']
+
+# --- 取り込み時に一度だけ計算する正規化列 ---
+# 発生時間_時   : 発生時間の「時」(0〜23)。判別できないものは HOUR_UNKNOWN
+# 西暦年        : 'H25' / 'R05' / '平成24年' / 2012 などを西暦の整数に（判別不能は欠損）
+# 事業場規模_区分: 事業場規模を安衛法の選任義務ラインで区分したもの
+HOUR_UNKNOWN = -1
+DERIVED_COLUMNS = ['発生時間_時', '西暦年', '事業場規模_区分']
+
+# 元号の頭文字・表記ごとの「元年の前年」（平成1年 = 1989年）
+ERA_OFFSETS = {'S': 1925, '昭和': 1925, 'H': 1988, '平成': 1988, 'R': 2018, '令和': 2018}
+
+# 事業場規模の意味的クレンジング（DBの限界 × 安衛法基準）
+SIZE_UNKNOWN = '⑥ 不明・その他'
+_SIZE_GROUPS = {
+    # 1. 1〜9人（体制未整備）
+    '① 9人以下（安全衛生推進者 選任義務なし）': ['0', '0～9', '1～9'],
+    # 2. 10〜49人（推進者選任）
+    '② 10～49人（安全衛生推進者 選任義務）': ['10～19', '10～29', '20～29', '30～39', '30～49', '40～49'],
+    # 3. 50〜299人（衛生管理者・産業医）
+    # ※衛生管理者の増員ライン(200人)は生データの「100～299」を分割できないためここで統合
+    '③ 50～299人（衛生管理者・産業医 選任義務）': ['50～99', '100～299'],
+    # 4. 300〜999人（製造業等で総括安全衛生管理者）
+    '④ 300～999人（製造業等で 総括安全衛生管理者）': ['300～499', '300～', '500～999'],
+    # 5. 1000人以上（全業種で総括・専属産業医）
+    '⑤ 1000人以上（専属産業医・全業種で総括）': ['1000～9999', '10000～'],
+}
+# 生の規模文字列 -> 区分 の早見表（1行ずつ関数を呼ばず、map 一発で引く）
+SIZE_BUCKETS = {raw: bucket for bucket, raws in _SIZE_GROUPS.items() for raw in raws}
+SIZE_BUCKET_ORDER = list(_SIZE_GROUPS) + [SIZE_UNKNOWN]
+
+_HOUR_LABELS = [f"{h:02d}時台" for h in range(24)] + ['不明']
+
+
+def size_bucket(series):
+    """事業場規模の生データを区分名に変換する（桁区切りのカンマは無視）。"""
+    raw = series.astype('string').str.replace(',', '', regex=False)
+    return raw.map(SIZE_BUCKETS).fillna(SIZE_UNKNOWN).astype(object)
+
+
+def hour_of_day(series):
+    """発生時間の表記揺れ（'10時台', '10～11', '不明', '8～7' 等）から時 (0〜23) を取り出す。"""
+    # 全角数字・全角の「～」は NFKC で半角に揃える（'１０～１１' → '10~11'）
+    s = series.astype('string').fillna('不明').str.normalize('NFKC')
+    hour = pd.to_numeric(s.str.extract(r'(\d+)', expand=False), errors='coerce')
+    # '8～7' は時間帯として解釈できない区分値なので、従来の format_time と同じく不明扱い。
+    # 数字を含まない値（'深夜', '時間不詳', '' 等）は hour が欠損になるので、比較結果の欠損も不明に倒す
+    unknown = (s.str.contains('不明', regex=False) | s.str.contains('8~7', regex=False)
+               | ~hour.between(0, 23).fillna(False))
+    return hour.where(~unknown.fillna(True).astype(bool), HOUR_UNKNOWN).astype('int8')
+
+
+def western_year(series):
+    """元号表記・西暦表記の年を西暦の整数 (Int16) に揃える。"""
+    s = series.astype('string').str.strip()
+    parts = s.str.extract(r'^(S|H|R|昭和|平成|令和)?\s*(\d+)', flags=re.IGNORECASE)
+    offset = parts[0].str.upper().map(ERA_OFFSETS)
+    number = pd.to_numeric(parts[1], errors='coerce')
+    # 元号が無い場合は4桁の西暦だけを採用する（2桁の数字は元号が判別できないため欠損）
+    year = (number + offset).where(offset.notna(), number.where(number >= 1900))
+    return year.astype('Int16')
+
+
+def add_derived_columns(df):
+    """正規化列（発生時間_時・西暦年・事業場規模_区分）を追加する。元の列はそのまま残す。"""
+    if '発生時間' in df.columns:
+        df['発生時間_時'] = hour_of_day(df['発生時間'])
+    if '年' in df.columns:
+        df['西暦年'] = western_year(df['年'])
+    if '事業場規模' in df.columns:
+        df['事業場規模_区分'] = size_bucket(df['事業場規模'])
+    return df
+
+
+def hour_label(df):
+    """'00時台'〜'23時台' / '不明' のラベルを返す。発生時間_時 が無い古いマスターでは発生時間から求める。"""
+    hours = df['発生時間_時'] if '発生時間_時' in df.columns else hour_of_day(df['発生時間'])
+    hours = pd.to_numeric(hours, errors='coerce').fillna(HOUR_UNKNOWN).astype(int).to_numpy()
+    positions = np.where((hours >= 0) & (hours <= 23), hours, 24)
+    return pd.Series(np.asarray(_HOUR_LABELS, dtype=object)[positions], index=df.index)
+
+
+def parquet_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def master_parquet_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def _as_int(series):
+    """欠損以外がすべて整数に変換できるときだけ Int16 にする。できなければ None。"""
+    numeric = pd.to_numeric(series, errors='coerce')
+    if numeric.notna().sum() != series.notna().sum():
+        return None
+    if not (numeric.dropna() % 1 == 0).all():
+        return None
+    return numeric.astype('Int16')
+
+
+def _as_category(series):
+    # Excel由来の列は数値と文字列が混在することがあるため、CSV経由と同じく文字列に揃えてから辞書化する
+    return series.where(series.isna(), series.astype(str)).astype('category')
+
+
+def _is_typed(series):
+    return isinstance(series.dtype, (pd.CategoricalDtype, pd.Int16Dtype))
+
+
+def to_typed_columns(df):
+    """マスターの列を Parquet 版と同じ型（Categorical / Int16）にその場で揃える。既に型付きの列はそのまま。"""
+    for col in INT_COLUMNS:
+        if col in df.columns and not _is_typed(df[col]):
+            as_int = _as_int(df[col])
+            df[col] = as_int if as_int is not None else _as_category(df[col])
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = _as_category(df[col])
+    return df
+
+
+def to_typed_master(df):
+    """マスターの列を Parquet 保存用の型（Categorical / Int16）に変換したコピーを返す。"""
+    return to_typed_columns(df.copy())
+
+
+def write_parquet_master(df, csv_path):
+    """CSVと同じ場所に型付きParquetを書き出す。pyarrow が無ければ何もせず None を返す。"""
+    if not parquet_available():
+        return None
+    parquet_path = master_parquet_path(csv_path)
+    to_typed_master(df).to_parquet(parquet_path, index=False)
+    return parquet_path
+
+
+class MasterWriter:
+    """マスターをワークブック単位で追記していく書き出し器（全件の DataFrame を作らない）。
+
+    append ごとに CSV へ行を書き足し（ヘッダーは最初の1回だけ）、close で型付きParquetを行グループ単位で書く。
+    整数列を Int16 にできるかは全ワークブックを見ないと決まらないため、Parquet用の行は一時ファイルに退避しておき、
+    close 時に型を確定してから1ワークブックずつ読み戻す。ピークメモリは最大のワークブック1つ分で済む。
+    出力は一時ファイルに書き、close で置き換えるので、途中で失敗しても前回のマスターは壊れない。
+    """
+
+    def __init__(self, csv_path, columns):
+        self.csv_path = csv_path
+        self.columns = list(columns)
+        self.rows = 0
+        self._csv = None
+        self._parts = []
+        self._spool_dir = csv_path + ".parts"
+        self._int_ok = {c: True for c in INT_COLUMNS if c in self.columns}
+
+    def append(self, df):
+        """df を追記し、列を揃えて record_id（マスターでの行番号）を index にしたものを返す。"""
+        records = df.reindex(columns=self.columns)
+        records.index = pd.RangeIndex(self.rows, self.rows + len(records), name='record_id')
+
+        if self._csv is None:
+            # utf-8-sig の BOM はファイル先頭に1回だけ書かれる
+            self._csv = open(self.csv_path + ".tmp", 'w', encoding='utf-8-sig', newline='')
+        records.to_csv(self._csv, index=False, header=self.rows == 0)
+
+        if parquet_available():
+            for col in self._int_ok:
+                if self._int_ok[col] and _as_int(records[col]) is None:
+                    self._int_ok[col] = False
+            os.makedirs(self._spool_dir, exist_ok=True)
+            part = os.path.join(self._spool_dir, f"{len(self._parts):05d}.pkl")
+            records.to_pickle(part)
+            self._parts.append(part)
+
+        self.rows += len(records)
+        return records
+
+    def _parquet_schema(self):
+        """列の宣言（Int16 にできた整数列 / 辞書型の列 / それ以外は文字列）から Parquet のスキーマを作る。
+
+        最初のワークブックから推定すると、そこで全件空欄だった列が null 型になり、後のワークブックを書けなくなる。
+        pandas 用のメタデータ（Int16 や Categorical への戻し方）も、同じ型の空の DataFrame から作る。
+        """
+        import pyarrow as pa
+
+        dtypes, fields = {}, []
+        for col in self.columns:
+            if self._int_ok.get(col):
+                dtypes[col], arrow_type = 'Int16', pa.int16()
+            elif col in INT_COLUMNS or col in CATEGORY_COLUMNS:
+                # 辞書型の列はワークブックごとに辞書が違っても同じ型として書けるよう揃える
+                dtypes[col], arrow_type = 'category', pa.dictionary(pa.int32(), pa.string())
+            else:
+                dtypes[col], arrow_type = str, pa.large_string()
+            fields.append(pa.field(col, arrow_type))
+        empty = pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in dtypes.items()})
+        metadata = pa.Schema.from_pandas(empty, preserve_index=False).metadata
+        return pa.schema(fields, metadata=metadata)
+
+    def _write_parquet(self, parquet_path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = self._parquet_schema()
+        with pq.ParquetWriter(parquet_path, schema) as writer:
+            for part in self._parts:
+                typed = pd.read_pickle(part).reset_index(drop=True)
+                for col in self.columns:
+                    if self._int_ok.get(col):
+                        typed[col] = pd.to_numeric(typed[col], errors='coerce').astype('Int16')
+                    elif col in INT_COLUMNS or col in CATEGORY_COLUMNS:
+                        typed[col] = _as_category(typed[col])
+                    else:
+                        # Excel 由来で数値が混じっても文字列の列として書けるよう揃える（欠損は欠損のまま）
+                        typed[col] = typed[col].where(typed[col].isna(), typed[col].astype(str))
+                writer.write_table(pa.Table.from_pandas(typed, preserve_index=False).cast(schema))
+
+    def close(self):
+        """CSV（と pyarrow があれば Parquet）を確定させる。Parquet を書いたときはそのパスを返す。"""
+        if self._csv is None:
+            return None
+        self._csv.close()
+        self._csv = None
+        os.replace(self.csv_path + ".tmp", self.csv_path)
+
+        parquet_path = None
+        if self._parts:
+            parquet_path = master_parquet_path(self.csv_path)
+            # CSV より後に置き換えて、parquet_is_fresh で新しい方と判定されるようにする
+            self._write_parquet(parquet_path + ".tmp")
+            os.replace(parquet_path + ".tmp", parquet_path)
+        shutil.rmtree(self._spool_dir, ignore_errors=True)
+        return parquet_path
+
+    def abort(self):
+        if self._csv is not None:
+            self._csv.close()
+            self._csv = None
+            os.remove(self.csv_path + ".tmp")
+        shutil.rmtree(self._spool_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        return False
+
+
+def parquet_is_fresh(parquet_path, csv_path):
+    """Parquet のマスターがあり、CSV より古くない（= CSV の代わりに読んでよい）か。"""
+    if not os.path.exists(parquet_path) or not parquet_available():
+        return False
+    # CSVだけが新しく作り直されている場合は古いParquetを使わない
+    return not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+
+
+def load_master(csv_path, columns=None):
+    """マスターを読み込む。新しいParquetがあればそちらを、無ければCSVを読む。
+
+    columns のうちマスターに無い列（古いマスターに無い正規化列など）は黙って読み飛ばす。
+    """
+    parquet_path = master_parquet_path(csv_path)
+    if parquet_is_fresh(parquet_path, csv_path):
+        if columns is not None:
+            import pyarrow.parquet as pq
+            available = set(pq.read_schema(parquet_path).names)
+            columns = [c for c in columns if c in available]
+        return pd.read_parquet(parquet_path, columns=columns)
+    usecols = None if columns is None else (lambda c: c in columns)
+    return pd.read_csv(csv_path, encoding='utf-8-sig', low_memory=False, usecols=usecols)
+
+
+def master_exists(csv_path):
+    return os.path.exists(csv_path) or parquet_is_fresh(master_parquet_path(csv_path), csv_path)
+
+
+def fill_unknown(df, columns, value='不明'):
+    """欠損を value で埋める。Categorical 列は先にカテゴリを追加してから埋める。"""
+    for col in columns:
+        if col not in df.columns:
+            continue
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and value not in df[col].cat.categories:
+            df[col] = df[col].cat.add_categories(value)
+        df[col] = df[col].fillna(value)
+    return df
+
+
+def compact_categories(df):
+    """絞り込み後に残った未使用カテゴリを落とす（crosstab 等に空の行列が出ないように）。"""
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
+    return df
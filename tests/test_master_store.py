@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from master_store import HOUR_UNKNOWN, hour_label, hour_of_day
+
+
+def test_hour_of_day_parses_hour_notations():
+    hours = hour_of_day(pd.Series(['10時台', '0時台', '23時台', '10～11']))
+    assert hours.tolist() == [10, 0, 23, 10]
+
+
+def test_hour_of_day_full_width_digits():
+    hours = hour_of_day(pd.Series(['１０～１１', '０８時台']))
+    assert hours.tolist() == [10, 8]
+
+
+def test_hour_of_day_unparseable_values_are_unknown():
+    values = ['深夜', '時間不詳', '', '不明', '8～7', '８～７', '24時台', None]
+    hours = hour_of_day(pd.Series(values, dtype=object))
+    assert hours.tolist() == [HOUR_UNKNOWN] * len(values)
+
+
+def test_hour_label_from_raw_column():
+    df = pd.DataFrame({'発生時間': ['１０～１１', '深夜', '', '9時台']})
+    assert hour_label(df).tolist() == ['10時台', '不明', '不明', '09時台']
@@ -0,0 +1,275 @@
+import os
+import re
+import sys
+import time
+import pickle
+import shutil
+import argparse
+from array import array
+
+import numpy as np
+
+# --- 災害状況の全文索引（文字 n-gram 転置インデックス） ---
+# 日本語は分かち書きされていないため、形態素ではなく文字2-gramで索引を作る。
+# 検索語の全2-gramを含むレコードを転置リストの積集合で絞り込み、最後に部分文字列として照合する。
+# 索引は本文を持たない（本文を抱えると一番大きい列をメモリに載せ直すことになる）。フレーズの最終照合では
+# 候補の record_id の本文だけを、呼び出し側が渡す fetch_texts（ストア / Parquet / DataFrame）から取り寄せる。
+NGRAM = 2
+# 索引ファイルの形式。本文を持っていた古い索引は読み込まず、ビルダーでの作り直しを促す
+TEXT_INDEX_VERSION = 2
+OUTPUT_DIR = "output"
+
+
+def text_index_path(table, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"text_index_{table}.pkl")
+
+
+def text_index_spill_dir(table, output_dir=OUTPUT_DIR):
+    """ビルダーがワークブックごとの転置リストを書き出す作業フォルダ。"""
+    return os.path.join(output_dir, f"text_index_{table}.spill")
+
+
+def _grams(text, n=NGRAM):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def new_text_index(n=NGRAM, spill_dir=None):
+    """空の索引を作る。add_texts で追記し、finish_text_index で検索用の形に固める。
+
+    spill_dir を渡すと、add_texts のたびにその回の転置リストを spill_dir へ書き出してメモリから手放し、
+    finish_text_index でまとめて連結する（ビルダーが全ワークブック分の転置リストを抱えないように）。
+    """
+    index = {'version': TEXT_INDEX_VERSION, 'n': n, 'record_ids': array('q'), 'postings': {}}
+    if spill_dir:
+        # 前回中断したビルドの書き出しが残っていれば捨てる
+        shutil.rmtree(spill_dir, ignore_errors=True)
+        os.makedirs(spill_dir)
+        index['spill_dir'], index['spills'] = spill_dir, []
+    return index
+
+
+def add_texts(index, texts):
+    """texts（index = record_id の Series）を索引に追記する。ワークブック単位で少しずつ足してよい。"""
+    n = index['n']
+    postings = index['postings']
+    start = len(index['record_ids'])
+    index['record_ids'].extend(int(i) for i in texts.index)
+
+    for pos, text in enumerate(texts.tolist(), start):
+        text = "" if not isinstance(text, str) else text
+        for gram in _grams(text, n):
+            bucket = postings.get(gram)
+            if bucket is None:
+                bucket = postings[gram] = array('i')
+            bucket.append(pos)
+
+    if 'spill_dir' in index and postings:
+        grams, offsets, flat = _pack(postings, n)
+        path = os.path.join(index['spill_dir'], f"spill_{len(index['spills']):05d}.npz")
+        np.savez(path, grams=grams, offsets=offsets, postings=flat)
+        index['spills'].append(path)
+        postings.clear()
+    return index
+
+
+def _pack(buckets, n):
+    """{2-gram: array('i')} を (2-gram の昇順配列, 区切り位置, 連結した転置リスト) に固める。buckets は空になる。"""
+    grams = sorted(buckets)
+    lengths = np.fromiter((len(buckets[g]) for g in grams), dtype=np.int64, count=len(grams))
+    offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    postings = np.empty(offsets[-1], dtype=np.int32)
+    for gram, start, stop in zip(grams, offsets[:-1], offsets[1:]):
+        postings[start:stop] = np.frombuffer(buckets.pop(gram), dtype=np.int32)
+    return np.array(grams, dtype=f"U{n}"), offsets, postings
+
+
+def _merge_spills(paths, n):
+    """書き出した転置リストを追記順に連結する。同じ 2-gram の位置は追記順 = 昇順なので並べ直さなくてよい。
+
+    先に各回の 2-gram と件数だけを読んで連結後の位置を決め、転置リストは1回分ずつ読んで書き込む。
+    """
+    grams = np.empty(0, dtype=f"U{n}")
+    for path in paths:
+        with np.load(path) as spill:
+            grams = np.union1d(grams, spill['grams'])
+    counts = np.zeros(len(grams), dtype=np.int64)
+    for path in paths:
+        with np.load(path) as spill:
+            counts[np.searchsorted(grams, spill['grams'])] += np.diff(spill['offsets'])
+    offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    postings = np.empty(offsets[-1], dtype=np.int32)
+    cursor = offsets[:-1].copy()
+    for path in paths:
+        with np.load(path) as spill:
+            gram_ids = np.searchsorted(grams, spill['grams'])
+            spill_offsets = spill['offsets']
+            lengths = np.diff(spill_offsets)
+            # 各要素の書き込み先 = その 2-gram の書き込み位置 + 回の中での通し番号 - 回の中での 2-gram の開始位置
+            shift = np.repeat(cursor[gram_ids] - spill_offsets[:-1], lengths)
+            postings[shift + np.arange(spill_offsets[-1])] = spill['postings']
+            cursor[gram_ids] += lengths
+    return grams, offsets, postings
+
+
+def finish_text_index(index):
+    """追記用の配列を検索用の形に固める。
+
+    転置リストは1本の int32 配列に連結し、2-gram の昇順配列 grams と区切り位置 offsets で引く
+    （2-gram ごとに numpy 配列や dict の項目を持つと、それだけで数十 MB になるため）。
+    """
+    buckets = index.pop('postings')
+    spill_dir, spills = index.pop('spill_dir', None), index.pop('spills', None)
+    if spill_dir:
+        index['grams'], index['offsets'], index['postings'] = _merge_spills(spills, index['n'])
+        shutil.rmtree(spill_dir, ignore_errors=True)
+    else:
+        index['grams'], index['offsets'], index['postings'] = _pack(buckets, index['n'])
+    index['record_ids'] = np.frombuffer(index['record_ids'], dtype=np.int64)
+    return index
+
+
+def build_text_index(texts, n=NGRAM):
+    """texts（index = record_id の Series）から転置インデックスを作る。
+
+    転置リストはレコードの位置（0始まり）の昇順配列で持ち、検索結果を返すときに record_id へ戻す。
+    """
+    return finish_text_index(add_texts(new_text_index(n), texts))
+
+
+def save_text_index(index, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return path
+
+
+_loaded = {}
+
+
+def load_text_index(path):
+    """索引ファイルを読み込む。同じファイルが更新されていなければ読み込み済みのものを使い回す。
+
+    形式の古い索引（TEXT_INDEX_VERSION が違うもの）は None を返す。
+    """
+    mtime = os.path.getmtime(path)
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            index = pickle.load(f)
+        if index.get('version') != TEXT_INDEX_VERSION:
+            index = None
+        cached = _loaded[path] = (mtime, index)
+    return cached[1]
+
+
+def _posting(index, gram):
+    """gram の転置リスト（レコードの位置の昇順配列）。索引に無ければ None。"""
+    grams = index['grams']
+    i = np.searchsorted(grams, gram)
+    if i == len(grams) or grams[i] != gram:
+        return None
+    return index['postings'][index['offsets'][i]:index['offsets'][i + 1]]
+
+
+def _match_term(index, term, fetch_texts):
+    """term を部分文字列として含むレコードの位置を返す。"""
+    grams = _grams(term, index['n'])
+    if not grams:
+        # 索引の n より短い語は、その語を含む2-gramの転置リストの和集合（n 文字未満の本文だけは拾えない）
+        hits = np.flatnonzero(np.char.find(index['grams'], term) >= 0)
+        lists = [index['postings'][index['offsets'][i]:index['offsets'][i + 1]] for i in hits]
+        return np.unique(np.concatenate(lists)) if lists else np.empty(0, dtype=np.int32)
+
+    lists = [_posting(index, g) for g in grams]
+    if any(p is None for p in lists):
+        return np.empty(0, dtype=np.int32)
+
+    lists.sort(key=len)
+    candidates = lists[0]
+    for p in lists[1:]:
+        if len(candidates) == 0:
+            break
+        candidates = np.intersect1d(candidates, p, assume_unique=True)
+
+    if len(term) == index['n'] or len(candidates) == 0:
+        return candidates
+    # 2-gram を全て含んでも連続しているとは限らないので、候補の本文だけを取り寄せてフレーズとして最終照合する
+    texts = fetch_texts(index['record_ids'][candidates])
+    return candidates[np.fromiter((isinstance(t, str) and term in t for t in texts), dtype=bool, count=len(candidates))]
+
+
+def parse_query(query):
+    """検索式を [[AND項, ...], ...]（外側が OR）に分解する。
+
+    空白区切りは AND、OR（または |）で OR、"..." で空白を含むフレーズを表す。
+    例: '巻き込まれ 回転 OR "挟まれ 死亡"'
+    """
+    groups, current = [], []
+    for quoted, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        if not quoted and word in ('OR', '|'):
+            if current:
+                groups.append(current)
+            current = []
+            continue
+        term = quoted if quoted else word
+        if term:
+            current.append(term)
+    if current:
+        groups.append(current)
+    return groups
+
+
+def search(index, query, fetch_texts):
+    """検索式に一致するレコードの record_id を昇順の配列で返す。
+
+    fetch_texts は record_id の配列を受け取り、同じ順の本文（欠損は str 以外）を返す関数。
+    索引の n 文字より長い語のフレーズ照合で、候補の行だけに使う。
+    """
+    matched = np.empty(0, dtype=np.int32)
+    for terms in parse_query(query):
+        hits = None
+        for term in sorted(terms, key=len, reverse=True):
+            term_hits = _match_term(index, term, fetch_texts)
+            hits = term_hits if hits is None else np.intersect1d(hits, term_hits, assume_unique=True)
+            if len(hits) == 0:
+                break
+        if hits is not None:
+            matched = np.union1d(matched, hits)
+    return np.sort(index['record_ids'][matched])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="災害状況の全文索引を検索する")
+    parser.add_argument("query", help='検索式（空白=AND, OR=または, "..."=フレーズ）')
+    parser.add_argument("--table", default="sibou", help="索引の対象（sibou / sisyou）")
+    parser.add_argument("--show", type=int, default=5, help="表示する件数")
+    args = parser.parse_args()
+
+    from accident_store import fetch_records, store_exists
+
+    path = text_index_path(args.table)
+    index = load_text_index(path) if os.path.exists(path) else None
+    if index is None:
+        print(f"[異常終了] 索引が見つからないか形式が古いです: {path}（先に build_fatal_db.py を実行してください）")
+        sys.exit(1)
+    if not store_exists(args.table):
+        print(f"[異常終了] 組み込みストアにテーブル {args.table} がありません（フレーズ照合の本文をストアから読みます）")
+        sys.exit(1)
+
+    def fetch_texts(record_ids):
+        return fetch_records(record_ids, columns=['災害状況'], table=args.table)['災害状況']
+
+    start = time.perf_counter()
+    record_ids = search(index, args.query, fetch_texts)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(f"検索式: {args.query} -> {len(record_ids)} 件 ({elapsed_ms:.1f} ms)")
+    for record_id, text in fetch_texts(record_ids[:args.show]).items():
+        print(f" [{record_id}] {text[:80]}")
+
+if __name__ == "__main__":
+    main()
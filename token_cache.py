@@ -0,0 +1,240 @@
+import os
+import re
+import glob
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from analyzers import Token, create_analyzer
+
+# --- 形態素解析結果の永続キャッシュ（テキストマイニング各ツール共通） ---
+# Janome は純 Python で、どのツールでも実行時間の大半を占める。同じ入力を何度も解析し直さないよう、
+# テキストの内容ハッシュ × 解析器（analyzers.py の janome / mecab / sudachi）とそのバージョン × ユーザー辞書 をキーに、
+# トークン列（表層形・原形・品詞）を保存する。
+# ストップワードや閾値はトークン化の後で効くので、それらを変えた再実行では形態素解析を一切行わない。
+#
+# 保存形式: 解析器とユーザー辞書の組ごとのフォルダに、まとめて解析した単位で「セグメント」(.npz) を書く。
+# セグメントは列指向で、テキストのキー・各テキストのトークン範囲・表層形/原形/品詞の語彙番号（int32）と、
+# 語彙そのもの（NUL 区切りの UTF-8）を持つ。1件ずつファイルを作らないので、数万件の災害状況でも軽い。
+TOKEN_CACHE_DIR = os.path.join("output", "cache", "tokens")
+
+# 長いテキスト（白書1部分など）は文の切れ目で CHUNK_CHARS 字前後に分け、分けた単位で解析する。
+# 並列化の単位にするためだが、ワーカー数によらず常に同じ分け方をするので、結果は直列でも並列でも同じになる。
+# （Janome 自身も内部で約500字ごとに区切って解析しており、切れ目の空白トークン以外はほぼ変わらない）
+CHUNK_CHARS = 2000
+
+# 未解析のテキストがあるたびにセグメントが1つ増えるので、この数を超えたら1つにまとめ直す
+# （起動時はすべてのセグメントのキーを読むため、細かいセグメントが溜まるほど遅くなる）
+MAX_SEGMENTS = 16
+
+
+def text_key(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest().encode('ascii')
+
+
+def _file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:16]
+
+
+def analyzer_namespace(analyzer):
+    """キャッシュのフォルダ名（解析器の種類・バージョンとユーザー辞書の内容で決まる）。"""
+    dict_part = _file_digest(analyzer.user_dict) if analyzer.user_dict else "default"
+    return f"{analyzer.name}-{analyzer.version}-c{CHUNK_CHARS}_{dict_part}"
+
+
+def split_text(text, size=CHUNK_CHARS):
+    """text を「。」（と続く空白）の直後で区切り、size 字前後の塊のリストにする。短いテキストはそのまま。"""
+    if len(text) <= size:
+        return [text]
+    chunks, current = [], ""
+    for sentence in re.findall(r'[^。]*。\s*|[^。]+$', text):
+        current += sentence
+        if len(current) >= size:
+            chunks.append(current)
+            current = ""
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# --- ワーカープロセス側（プロセスごとに解析器を1つだけ作って使い回す） ---
+_worker_analyzer = None
+
+
+def _init_worker(analyzer_name, user_dict):
+    global _worker_analyzer
+    _worker_analyzer = create_analyzer(analyzer_name, user_dict)
+
+
+def _tokenize_chunk(text):
+    return _worker_analyzer.tokenize(text)
+
+
+def _encode_vocab(words):
+    return np.frombuffer("\0".join(words).encode('utf-8'), dtype=np.uint8)
+
+
+def _decode_vocab(array):
+    return array.tobytes().decode('utf-8').split("\0")
+
+
+class TokenCache:
+    """テキスト → トークン列 のキャッシュ。無いものだけ analyzer（既定は Janome）で解析し、セグメントとして追記する。
+
+    workers > 1 なら、未解析のテキスト（長いものは分割した塊）をプロセスプールで並列に解析する。
+    各ワーカーは解析器を1つだけ作り、結果は入力の順に受け取る。
+    Windows（spawn）ではワーカーが呼び出し元のスクリプトを import し直すため、並列で使うスクリプトは
+    本体を if __name__ == "__main__": でガードすること。
+    """
+
+    def __init__(self, cache_dir=TOKEN_CACHE_DIR, user_dict=None, workers=1, analyzer='janome'):
+        self.user_dict = user_dict
+        self.workers = max(1, workers or 1)
+        self.analyzer = create_analyzer(analyzer, user_dict)
+        self.directory = os.path.join(cache_dir, analyzer_namespace(self.analyzer))
+        self.hits = 0
+        self.misses = 0
+        # ダッシュボード（st.cache_resource）では複数のセッションが同じインスタンスを使うため、
+        # 解析・書き出し・まとめ直しは1つずつ行う
+        self._lock = threading.Lock()
+        self._segments = {}
+        self._index = {}
+        self._scan()
+
+    def _segment_paths(self):
+        return sorted(glob.glob(os.path.join(self.directory, "seg_*.npz")))
+
+    def _scan(self):
+        """フォルダのセグメントからキー → (セグメント, 位置) の対応を作り直す。"""
+        self._segments.clear()
+        self._index.clear()
+        for path in self._segment_paths():
+            with np.load(path) as seg:
+                for i, key in enumerate(seg['keys'].tolist()):
+                    self._index[key] = (path, i)
+
+    def _analyze(self, texts):
+        jobs = [(i, chunk) for i, text in enumerate(texts) for chunk in split_text(text)]
+        chunks = [chunk for _, chunk in jobs]
+        results = [[] for _ in texts]
+        if self.workers > 1 and len(jobs) > 1:
+            workers = min(self.workers, len(jobs))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self.analyzer.name, self.user_dict)) as pool:
+                # 小さい塊を1件ずつ送ると往復の負担が勝つため、ワーカーあたり数回に分けてまとめて渡す
+                chunksize = max(1, len(chunks) // (workers * 4))
+                for (i, _), tokens in zip(jobs, pool.map(_tokenize_chunk, chunks, chunksize=chunksize)):
+                    results[i].extend(tokens)
+        else:
+            for (i, _), tokens in zip(jobs, map(self.analyzer.tokenize, chunks)):
+                results[i].extend(tokens)
+        return results
+
+    def _load_segment(self, path):
+        seg = self._segments.get(path)
+        if seg is None:
+            with np.load(path) as data:
+                seg = {name: data[name] for name in ('offsets', 'surface', 'base_form', 'part_of_speech')}
+                seg['vocab'] = _decode_vocab(data['vocab'])
+            self._segments[path] = seg
+        return seg
+
+    def _read(self, path, i):
+        seg = self._load_segment(path)
+        start, end = seg['offsets'][i], seg['offsets'][i + 1]
+        vocab = seg['vocab']
+        return [Token(vocab[s], vocab[b], vocab[p]) for s, b, p in
+                zip(seg['surface'][start:end].tolist(), seg['base_form'][start:end].tolist(),
+                    seg['part_of_speech'][start:end].tolist())]
+
+    def _save_segment(self, keys, offsets, vocab, columns):
+        """列の配列をセグメント1つとして書き出す（一時ファイルから置き換え）。"""
+        os.makedirs(self.directory, exist_ok=True)
+        digest = hashlib.sha1(b"".join(keys)).hexdigest()[:16]
+        path = os.path.join(self.directory, f"seg_{digest}.npz")
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(tmp, keys=np.array(keys, dtype='S40'), offsets=np.asarray(offsets, dtype=np.int64),
+                            vocab=_encode_vocab(vocab),
+                            **{name: np.asarray(ids, dtype=np.int32) for name, ids in columns.items()})
+        os.replace(tmp, path)
+        for i, key in enumerate(keys):
+            self._index[key] = (path, i)
+        return path
+
+    def _write_segment(self, keys, token_lists):
+        """解析結果をセグメント1つとして書き出す。"""
+        vocab = {}
+        columns = {'surface': [], 'base_form': [], 'part_of_speech': []}
+        offsets = [0]
+        for tokens in token_lists:
+            for token in tokens:
+                for name in columns:
+                    columns[name].append(vocab.setdefault(getattr(token, name), len(vocab)))
+            offsets.append(len(columns['surface']))
+        return self._save_segment(keys, offsets, list(vocab), columns)
+
+    def compact(self):
+        """フォルダのセグメントを1つにまとめ直す（同じキーが複数あれば先に読んだものを残す）。
+
+        トークンは組み立て直さず、語彙番号を付け替えて列どうしを連結する。
+        """
+        paths = self._segment_paths()
+        if len(paths) <= 1:
+            return
+        vocab = {}
+        keys, seen = [], set()
+        columns = {'surface': [], 'base_form': [], 'part_of_speech': []}
+        lengths = []
+        for path in paths:
+            with np.load(path) as seg:
+                seg_keys = seg['keys'].tolist()
+                keep = np.array([key not in seen for key in seg_keys], dtype=bool)
+                seen.update(seg_keys)
+                keys.extend(key for key, kept in zip(seg_keys, keep) if kept)
+                seg_lengths = np.diff(seg['offsets'])
+                lengths.append(seg_lengths[keep])
+                token_keep = np.repeat(keep, seg_lengths)
+                new_ids = np.array([vocab.setdefault(word, len(vocab)) for word in _decode_vocab(seg['vocab'])],
+                                   dtype=np.int32)
+                for name in columns:
+                    columns[name].append(new_ids[seg[name][token_keep]])
+        offsets = np.concatenate([[0], np.cumsum(np.concatenate(lengths))])
+        merged = self._save_segment(keys, offsets, list(vocab),
+                                    {name: np.concatenate(parts) for name, parts in columns.items()})
+        for path in paths:
+            if path != merged:
+                os.remove(path)
+        self._scan()
+
+    def tokenize_many(self, texts):
+        """texts それぞれのトークン列（Token のリスト）を、texts と同じ順で返す。"""
+        with self._lock:
+            try:
+                return self._tokenize_many(texts)
+            except FileNotFoundError:
+                # 別のプロセスがセグメントをまとめ直した後なら、フォルダを読み直してやり直す
+                self._scan()
+                return self._tokenize_many(texts)
+
+    def _tokenize_many(self, texts):
+        keys = [text_key(text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._index and key not in missing:
+                missing[key] = text
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+
+        fresh = {}
+        if missing:
+            fresh = dict(zip(missing, self._analyze(list(missing.values()))))
+            self._write_segment(list(fresh), list(fresh.values()))
+            if len(self._segment_paths()) > MAX_SEGMENTS:
+                self.compact()
+        return [fresh[key] if key in fresh else self._read(*self._index[key]) for key in keys]
+
+    def tokenize(self, text):
+        return self.tokenize_many([text])[0]
@@ -1,13 +1,16 @@
 import os
+import sys
 import glob
-import itertools
 import networkx as nx
 import matplotlib.pyplot as plt
 import japanize_matplotlib
 import re
-from janome.tokenizer import Tokenizer
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cooccurrence import association_scores, cooccurrence_counts, select_pairs, top_edges, top_edges_per_node
+from token_cache import TokenCache
+
 # --- 1. 空間設計（ディレクトリと経路） ---
 INPUT_TEXT = "input/input_製造業_一般動力機械_20260403_1542.txt"
 STOPWORDS_DIR = "stopwords"
@@ -23,6 +26,8 @@ OUTPUT_IMAGE = os.path.join(OUTPUT_DIR, f"network_{base_name}_{current_time}.png
 # ★分析の解像度調整パラメータ
 MIN_EDGE_WEIGHT = 5   # 最低何回ペアになったら線を結ぶか
 MAX_NODES = 50         # 画面に表示する最大単語数
+EDGE_MEASURE = "count"  # 辺を選ぶ指標（count / pmi / npmi / jaccard / dice / llr。既定の count は従来どおり共起回数順）
+EDGES_PER_NODE = 5     # count 以外の指標で、各単語から上位何本の辺を残すか（None なら絞らない）
 
 print(f"--- 共起ネットワーク分析エンジン起動 [{current_time}] ---")
 
@@ -51,13 +56,14 @@ sentences = text.split('。')
 
 # --- 4. 形態素解析と共起（ペア）のカウント ---
 print("単語の相関関係を計算中...")
-t = Tokenizer()
-pair_counts = {}
+# 全文をまとめてキャッシュに問い合わせ、未解析の文だけを形態素解析する
+sentences = [sentence for sentence in sentences if sentence]
+sentence_tokens = TokenCache().tokenize_many(sentences)
+sentence_nouns = []
 
-for sentence in sentences:
-    if not sentence: continue
+for tokens in sentence_tokens:
     nouns = []
-    for token in t.tokenize(sentence):
+    for token in tokens:
         word = token.surface
         part_of_speech = token.part_of_speech.split(',')[0]
         
@@ -68,23 +74,28 @@ for sentence in sentences:
             and len(word) > 1):
             
             nouns.append(word)
-    
-    sorted_nouns = sorted(list(set(nouns)))
-    for pair in itertools.combinations(sorted_nouns, 2):
-        pair_counts[pair] = pair_counts.get(pair, 0) + 1
+    sentence_nouns.append(nouns)
+
+# 文 × 単語の疎行列から共起回数を一括で求める（MIN_EDGE_WEIGHT 未満の組は最初から作らない）
+terms, df_counts, pair_matrix = cooccurrence_counts(sentence_nouns, min_count=MIN_EDGE_WEIGHT)
+
+# 関連の強さの指標で選ぶときは、どの文にも出る語が全体を占めないよう各単語の上位の辺だけを残す（線の太さは共起回数のまま）
+scores = association_scores(pair_matrix, df_counts, len(sentence_nouns), EDGE_MEASURE)
+if EDGE_MEASURE != "count" and EDGES_PER_NODE:
+    keep = top_edges_per_node(scores, EDGES_PER_NODE)
+    scores, pair_matrix = select_pairs(scores, keep), select_pairs(pair_matrix, keep)
 
 # --- 5. ネットワーク構造の構築 ---
 print("ネットワークを構築中...")
 G = nx.Graph()
 
-sorted_pairs = sorted(pair_counts.items(), key=lambda x: x[1], reverse=True)
+sorted_pairs = top_edges(terms, scores, pair_matrix)
 node_degrees = {}
 
-for pair, count in sorted_pairs:
-    if count >= MIN_EDGE_WEIGHT:
-        G.add_edge(pair[0], pair[1], weight=count)
-        node_degrees[pair[0]] = node_degrees.get(pair[0], 0) + count
-        node_degrees[pair[1]] = node_degrees.get(pair[1], 0) + count
+for pair, score, count in sorted_pairs:
+    G.add_edge(pair[0], pair[1], weight=count, score=score)
+    node_degrees[pair[0]] = node_degrees.get(pair[0], 0) + count
+    node_degrees[pair[1]] = node_degrees.get(pair[1], 0) + count
 
 if len(G.nodes) > MAX_NODES:
     print(f"単語数が多すぎるため、上位 {MAX_NODES} 個に絞り込みます...")
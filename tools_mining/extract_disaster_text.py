@@ -1,8 +1,14 @@
-import pandas as pd
 import os
 import re
+import sys
 from datetime import datetime
 
+# ルート直下の共通モジュール（master_store / accident_store）を読めるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from accident_store import query_records, store_columns, store_exists
+from master_store import hour_label, load_master, master_exists
+from text_index import build_text_index, load_text_index, search, text_index_path
+
 # --- 1. 空間設定と抽出条件（ここを毎回書き換えて狙い撃つ） ---
 INPUT_CSV = "output/master_sibou_all_industries.csv"
 OUTPUT_DIR = "input"  # 次の分析エンジンの入力フォルダに直接吐き出す
@@ -13,53 +19,59 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 TARGET_INDUSTRY = "製造業"           # 大分類（例: "製造業", "建設業", None）
 TARGET_CAUSE = "一般動力機械"          # 起因物の中分類（例: "動力運搬機", "一般動力機械", None）
 TARGET_HOUR = None               # 発生時間帯（例: "10時台", "08時台", None）
+TARGET_KEYWORD = None            # 災害状況のキーワード（例: "巻き込まれ", "巻き込まれ OR 挟まれ", None）
 
 # 出力ファイル名のタイムスタンプ
 current_time = datetime.now().strftime("%Y%m%d_%H%M")
 
 print(f"--- テキスト抽出エンジン起動 [{current_time}] ---")
 
-# --- 2. 時間の整形ロジック（お馴染みの防衛線） ---
-def format_time(t_str):
-    if pd.isna(t_str) or '不明' in str(t_str) or '8～7' in str(t_str):
-        return '不明'
-    match = re.search(r'(\d+)', str(t_str))
-    if match:
-        hour = int(match.group(1))
-        return f"{hour:02d}時台"
-    return '不明'
-
-# --- 3. データの読み込みと純化 ---
-print("マスターデータベースを読み込み中...")
-if not os.path.exists(INPUT_CSV):
-    print(f"[異常終了] マスターCSVが見つかりません: {INPUT_CSV}")
-    exit()
-
-df = pd.read_csv(INPUT_CSV, encoding='utf-8-sig', low_memory=False)
+# --- 2. データの読み込みとフィルターの容赦ない適用 ---
+filter_names = [name for name in (TARGET_INDUSTRY, TARGET_CAUSE) if name]
+
+if store_exists():
+    # 組み込みストアがあれば、業種・起因物の絞り込みはDB側（索引）で済ませ、該当行の必要列だけを受け取る
+    print("組み込みストアに抽出条件を問い合わせ中...")
+    filtered_df = query_records(
+        {'業種_大分類': TARGET_INDUSTRY, '起因物_中分類': TARGET_CAUSE},
+        columns=store_columns(['年', '発生時間', '発生時間_時', '災害状況'])
+    )
+else:
+    print("マスターデータベースを読み込み中...")
+    if not master_exists(INPUT_CSV):
+        print(f"[異常終了] マスターCSVが見つかりません: {INPUT_CSV}")
+        exit()
+
+    # 型付きParquetがあればそちらを優先して読む
+    filtered_df = load_master(INPUT_CSV)
+    if TARGET_INDUSTRY:
+        filtered_df = filtered_df[filtered_df['業種_大分類'] == TARGET_INDUSTRY]
+    if TARGET_CAUSE:
+        filtered_df = filtered_df[filtered_df['起因物_中分類'] == TARGET_CAUSE]
 
 # 必須項目の欠損を除去
-df = df.dropna(subset=['災害状況', '年'])
-
-# 時間の整形
-if '発生時間' in df.columns:
-    df['発生時間_整形'] = df['発生時間'].apply(format_time)
+filtered_df = filtered_df.dropna(subset=['災害状況', '年'])
 
-# --- 4. フィルターの容赦ない適用 ---
-filtered_df = df.copy()
-filter_names = []
-
-if TARGET_INDUSTRY:
-    filtered_df = filtered_df[filtered_df['業種_大分類'] == TARGET_INDUSTRY]
-    filter_names.append(TARGET_INDUSTRY)
-
-if TARGET_CAUSE:
-    filtered_df = filtered_df[filtered_df['起因物_中分類'] == TARGET_CAUSE]
-    filter_names.append(TARGET_CAUSE)
+# 時間の整形（取り込み時に正規化済みの「発生時間_時」からラベルを引く）
+if '発生時間' in filtered_df.columns:
+    filtered_df['発生時間_整形'] = hour_label(filtered_df)
 
 if TARGET_HOUR:
     filtered_df = filtered_df[filtered_df['発生時間_整形'] == TARGET_HOUR]
     filter_names.append(TARGET_HOUR)
 
+if TARGET_KEYWORD:
+    # 全文索引で該当 record_id を引き、業種・起因物の絞り込み結果と突き合わせる
+    index_path = text_index_path("sibou")
+    text_index = load_text_index(index_path) if os.path.exists(index_path) else None
+    if text_index is None:
+        print("[通知] 全文索引が無い（または形式が古い）ため、絞り込み済みの行からその場で索引を作ります。")
+        text_index = build_text_index(filtered_df['災害状況'])
+    # フレーズ照合の本文は絞り込み済みの行から引く（それ以外の record_id はどのみち残らない）
+    record_ids = search(text_index, TARGET_KEYWORD, lambda ids: filtered_df['災害状況'].reindex(ids))
+    filtered_df = filtered_df[filtered_df.index.isin(record_ids)]
+    filter_names.append(re.sub(r'[\\/:*?"<>|\s]+', '_', TARGET_KEYWORD))
+
 # 抽出件数の確認
 record_count = len(filtered_df)
 print(f"抽出条件: {' / '.join(filter_names) if filter_names else '全件'}")
@@ -1,9 +1,9 @@
 import os
+import sys
 import glob
 import pandas as pd
 import matplotlib.pyplot as plt
 from wordcloud import WordCloud
-from janome.tokenizer import Tokenizer
 import collections
 from matplotlib import font_manager
 import re
@@ -11,6 +11,9 @@ from datetime import datetime
 import numpy as np
 from PIL import Image
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from token_cache import TokenCache
+
 # --- 1. 空間設計と制御パラメータ ---
 INPUT_TEXT = "input/input_製造業_動力運搬機_20260403_1523.txt" 
 STOPWORDS_DIR = "stopwords"               
@@ -58,7 +61,8 @@ if not os.path.exists(INPUT_TEXT):
 with open(INPUT_TEXT, "r", encoding="utf-8") as f:
     text = f.read()
 
-t = Tokenizer()
+# 形態素解析の結果はキャッシュし、同じテキストの再実行では解析を省く
+t = TokenCache()
 words = []
 for token in t.tokenize(text):
     word = token.surface
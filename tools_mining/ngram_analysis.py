@@ -1,12 +1,15 @@
 import os
+import sys
 import glob
 import re
 import collections
 import matplotlib.pyplot as plt
 import japanize_matplotlib
-from janome.tokenizer import Tokenizer
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from token_cache import TokenCache
+
 # --- 1. 空間設計（ディレクトリと経路） ---
 INPUT_TEXT = "input/input_死亡労災製造業.txt"  # 分析対象のテキスト
 STOPWORDS_DIR = "stopwords"     # ストップワード群を格納するフォルダ
@@ -41,7 +44,8 @@ if not os.path.exists(INPUT_TEXT):
 with open(INPUT_TEXT, 'r', encoding='utf-8') as f:
     text = f.read()
 
-t = Tokenizer()
+# 形態素解析の結果はキャッシュし、同じテキストの再実行では解析を省く
+t = TokenCache()
 token_list = []
 tokens = t.tokenize(text)
 
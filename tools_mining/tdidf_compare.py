@@ -3,10 +3,12 @@ import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 from sklearn.feature_extraction.text import TfidfVectorizer
-from janome.tokenizer import Tokenizer
 from matplotlib import font_manager
 import re
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from token_cache import TokenCache
+
 # --- 白書用マスター・ストップワード ---
 STOP_WORDS = [
     "もの", "こと", "ため", "それ", "これ", "よう", "さん", "の", 
@@ -54,10 +56,13 @@ if not os.path.exists("output"):
 print("--- システム事前チェック完了 ---\n")
 
 # --- 3. メイン処理 ---
+# 形態素解析の結果はキャッシュし、ストップワードだけ変えた再実行では解析を省く
+# （キャッシュの索引は開くときに全セグメントから作るので、1回だけ開いて使い回す）
+token_cache = TokenCache()
+
 def tokenize_and_filter(text):
-    t = Tokenizer()
     words = []
-    for token in t.tokenize(text):
+    for token in token_cache.tokenize(text):
         word = token.surface
         part = token.part_of_speech.split(',')[0]
         # ストップワードに含まれていないかチェックを追加
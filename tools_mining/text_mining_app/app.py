@@ -3,12 +3,15 @@ import pdfplumber
 import pandas as pd
 import matplotlib.pyplot as plt
 from wordcloud import WordCloud
-from janome.tokenizer import Tokenizer
 import collections
 import re
 import os
 import numpy as np
 from PIL import Image
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from token_cache import TokenCache
 
 # --- ページ設定 ---
 st.set_page_config(page_title="テキストマイニングアプリ", layout="wide")
@@ -152,10 +155,15 @@ def clean_text(text: str) -> str:
     text = re.sub(r'\s+', ' ', text)
     return text.strip()
 
+@st.cache_resource
+def get_token_cache():
+    # キャッシュの索引は開くときに全セグメントから作るため、プロセスで1つだけ開いて全セッションで使い回す
+    return TokenCache()
+
 def analyze_morph(text: str, stop_words: list) -> list:
-    t = Tokenizer()
+    # 同じファイルを再分析するときは、形態素解析をキャッシュから読む（ストップワードは後で効く）
     words = []
-    for token in t.tokenize(text):
+    for token in get_token_cache().tokenize(text):
         if token.part_of_speech.startswith('名詞'):
             word = token.surface
             if len(word) > 1 and word not in stop_words: